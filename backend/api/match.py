@@ -1,17 +1,27 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import os
 
-from ..core import db_mongo, db_qdrant, embedder
+from ..core import db_mongo, db_qdrant, embedder, executors, experience_extractor, lexical_index, match_cache, metrics, scoring, skill_extractor, tracing
 
 router = APIRouter()
 
+# Minimum number of vector hits re-ranked per request (at least top_k * 2).
+CANDIDATE_POOL = int(os.getenv("MATCH_CANDIDATE_POOL", "200"))
+LEXICAL_ONLY = metrics.counter("match_lexical_only_candidates", "Re-ranked candidates found by BM25 but not the vector search")
+
 class MatchRequest(BaseModel):
-    jd_text: str
+    jd_text: Optional[str] = None
+    jd_id: Optional[str] = None  # reuse a JD stored by /jd/process-jd instead of re-parsing text
     top_k: int = 5
     skill_weight: float = 0.4
     exp_weight: float = 0.2
     embed_weight: float = 0.4
+    candidate_pool: Optional[int] = None  # hits to re-rank; defaults to max(top_k * 2, MATCH_CANDIDATE_POOL)
+    must_have_skills: List[str] = []  # hard filters applied inside the Qdrant query
+    min_years: Optional[float] = None
+    use_cache: bool = True  # jd_id requests only; see core/match_cache.py
 
 class CandidateMatch(BaseModel):
     employee_id: str
@@ -26,50 +36,156 @@ class CandidateMatch(BaseModel):
 
 class MatchResponse(BaseModel):
     results: List[CandidateMatch]
+    cached: bool = False
+
+class JobMatch(BaseModel):
+    jd_id: str
+    final_score: float
+    embedding_score: float
+    skill_score: float
+    experience_score: float
+    matched_skills: List[str]
+    missing_skills: List[str]
+    min_experience: float
+    seniority: str
+
+class JobsResponse(BaseModel):
+    employee_id: str
+    results: List[JobMatch]
+
 
+def load_profiles(hits: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Scoring fields per hit: from the Qdrant payload, else one bulk Mongo fetch."""
+    profiles = {}
+    missing = []
+    for r in hits:
+        if all(f in r for f in db_qdrant.SCORING_FIELDS):
+            profiles[r['employee_id']] = {f: r[f] for f in db_qdrant.SCORING_FIELDS}
+        else:
+            missing.append(r['employee_id'])
+    for employee_id, prof in db_mongo.get_resumes_by_employees(missing).items():
+        profiles[employee_id] = {
+            "skills": prof.get('skills', []),
+            "experience_years": prof.get('experience_years', 0.0),
+            "summary": prof.get('sections', {}).get('summary', ''),
+        }
+    return profiles
+
+
+async def resolve_jd(req: MatchRequest) -> Tuple[List[float], List[str], float, str]:
+    """Return (embedding, required skills, min experience, text) for the request's JD, computed once."""
+    if req.jd_id:
+        # the text is only needed for the lexical search
+        jd = await executors.io.run(db_mongo.get_jd, req.jd_id, lexical_index.ENABLED)
+        if not jd:
+            raise HTTPException(status_code=404, detail="JD not found")
+        return jd["embedding"], jd.get("skills", []), float(jd.get("min_experience", 0.0)), jd.get("raw_text") or ""
+    if not req.jd_text or not req.jd_text.strip():
+        raise HTTPException(status_code=400, detail="Provide jd_id or jd_text")
+    jd_vec = await executors.embed.admit(embedder.submit_text, req.jd_text)
+    required_skills = skill_extractor.extract_skills(req.jd_text)
+    return jd_vec, required_skills, experience_extractor.required_years(req.jd_text), req.jd_text
+
+
+def add_lexical_hits(jd_vec: List[float], jd_text: str, required_skills: List[str], hits: List[Dict[str, Any]],
+                     pool_size: int, must_skills: List[str], min_years: Optional[float]) -> List[Dict[str, Any]]:
+    """Fuse vector hits with BM25 hits (reciprocal rank fusion) and keep the best pool_size.
+
+    Candidates only the lexical index found get their max-sim score from a
+    vector search restricted to them, so every hit is scored the same way.
+    """
+    lexical = lexical_index.search(jd_text, required_skills, pool_size, must_skills, min_years)
+    by_id = {h['employee_id']: h for h in hits}
+    fused = lexical_index.fuse([list(by_id), [e for e, _ in lexical]])[:pool_size]
+    missing = [e for e in fused if e not in by_id]
+    if missing:
+        LEXICAL_ONLY.inc(len(missing))
+        for h in db_qdrant.search_max_sim(jd_vec, len(missing), must_skills, min_years, employee_ids=missing):
+            by_id[h['employee_id']] = h
+    return [by_id[e] for e in fused if e in by_id]
 
-def compute_skill_score(required: List[str], candidate: List[str]) -> (float, List[str], List[str]):
-    req_set = set(s.lower() for s in required)
-    cand_set = set(s.lower() for s in candidate)
-    matched = req_set & cand_set
-    score = len(matched) / len(req_set) if req_set else 0.0
-    return score, [m.capitalize() for m in matched], [r.capitalize() for r in req_set - matched]
 
 @router.post("/run", response_model=MatchResponse)
 async def run_match(req: MatchRequest):
-    jd_vec = embedder.embed_text(req.jd_text)
-    # naive required skills extraction (reuse skill extractor logic via Mongo skill dict if stored) - placeholder
-    from ..core.skill_extractor import extract_skills
-    required_skills = extract_skills(req.jd_text)
-
-    # search similar embeddings
-    results = db_qdrant.search(jd_vec, top_k=req.top_k * 2)  # get extra for filtering
-    candidates: List[CandidateMatch] = []
-    for r in results:
-        prof = db_mongo.get_resume_by_employee(r['employee_id'])
-        if not prof:
-            continue
-        cand_skills = prof.get('skills', [])
-        skill_score, matched, missing = compute_skill_score(required_skills, cand_skills)
-        exp_years = prof.get('experience_years', 0.0)
-        # attempt to parse JD min experience from text (simple pattern)
-        import re
-        m = re.search(r"(\d+)\s+years", req.jd_text, re.IGNORECASE)
-        jd_min_exp = float(m.group(1)) if m else 0.0
-        experience_score = min(exp_years / jd_min_exp, 1.0) if jd_min_exp > 0 else 0.0
-        embedding_score = r['score']  # already cosine similarity
-        final = (skill_score * req.skill_weight) + (experience_score * req.exp_weight) + (embedding_score * req.embed_weight)
-        candidates.append(CandidateMatch(
-            employee_id=r['employee_id'],
-            final_score=round(final, 4),
-            embedding_score=round(embedding_score, 4),
-            skill_score=round(skill_score, 4),
-            experience_score=round(experience_score, 4),
+    pool_size = req.candidate_pool or max(req.top_k * 2, CANDIDATE_POOL)
+    weights = (req.skill_weight, req.exp_weight, req.embed_weight)
+    # "K8s" filters on the stored "kubernetes"; also keys the cache and the lexical filter
+    must_skills = skill_extractor.canonical_skills(req.must_have_skills)
+    cache_key = None
+    if req.jd_id and req.use_cache and match_cache.ENABLED:
+        cache_key = match_cache.make_key(req.jd_id, weights, must_skills, req.min_years, pool_size)
+        with tracing.stage("cache"):
+            rows = await executors.io.run(match_cache.get, cache_key, req.top_k)
+        if rows is not None:
+            return MatchResponse(results=rows, cached=True)
+
+    with tracing.stage("jd"):
+        jd_vec, required_skills, jd_min_exp, jd_text = await resolve_jd(req)
+
+    # search similar embeddings, then re-rank the whole pool in one vectorized pass
+    with tracing.stage("search"):
+        results = await executors.io.run(
+            db_qdrant.search_max_sim, jd_vec, top_k=pool_size, must_skills=must_skills, min_years=req.min_years)
+    if lexical_index.ENABLED:
+        with tracing.stage("lexical"):
+            results = await executors.io.run(
+                add_lexical_hits, jd_vec, jd_text, required_skills, results, pool_size, must_skills, req.min_years)
+    with tracing.stage("profiles"):
+        profiles = await executors.io.run(load_profiles, results)
+    results = [r for r in results if r['employee_id'] in profiles]
+    depth = max(req.top_k, match_cache.DEPTH) if cache_key else req.top_k
+    with tracing.stage("score"):
+        rows = scoring.rank(
+            [r['employee_id'] for r in results],
+            [profiles[r['employee_id']] for r in results],
+            [r['score'] for r in results],  # already cosine similarity
+            required_skills, jd_min_exp, *weights, k=depth,
+        )
+    if cache_key:
+        with tracing.stage("cache"):
+            await executors.io.run(
+                match_cache.put, cache_key, req.jd_id, weights, must_skills, req.min_years, pool_size, rows, depth)
+    return MatchResponse(results=rows[:req.top_k])
+
+
+@router.get("/jobs-for/{employee_id}", response_model=JobsResponse)
+async def jobs_for_candidate(employee_id: str, top_k: int = 5, skill_weight: float = 0.4, exp_weight: float = 0.2,
+                             embed_weight: float = 0.4, candidate_pool: Optional[int] = None, qualified_only: bool = False):
+    """Open roles ranked for a stored candidate, reusing its resume vector."""
+    profiles = await executors.io.run(
+        db_mongo.get_resumes_by_employees, [employee_id],
+        {"_id": 0, "employee_id": 1, "embedding_id": 1, "skills": 1, "experience_years": 1})
+    prof = profiles.get(employee_id)
+    if not prof:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    vec = await executors.io.run(db_qdrant.get_vector, prof["embedding_id"])
+    if vec is None:
+        raise HTTPException(status_code=404, detail="Embedding not found")
+    years = float(prof.get("experience_years", 0.0))
+
+    pool_size = candidate_pool or max(top_k * 2, CANDIDATE_POOL)
+    hits = await executors.io.run(
+        db_qdrant.search_jds, vec, top_k=pool_size, max_min_experience=years if qualified_only else None)
+    scores = scoring.score_jobs(
+        prof.get("skills", []), years,
+        [h.get("skills", []) for h in hits],
+        [h.get("min_experience", 0.0) for h in hits],
+        [h["score"] for h in hits],
+        skill_weight, exp_weight, embed_weight,
+    )
+    jobs: List[JobMatch] = []
+    for i in scoring.top_k(scores.final, top_k):
+        h = hits[i]
+        _, matched, missing = scoring.skill_overlap(h.get("skills", []), prof.get("skills", []))
+        jobs.append(JobMatch(
+            jd_id=h["jd_id"],
+            final_score=round(float(scores.final[i]), 4),
+            embedding_score=round(float(scores.embedding[i]), 4),
+            skill_score=round(float(scores.skill[i]), 4),
+            experience_score=round(float(scores.experience[i]), 4),
             matched_skills=matched,
             missing_skills=missing,
-            experience_years=exp_years,
-            summary=prof.get('sections', {}).get('summary', '')[:500]
+            min_experience=h.get("min_experience", 0.0),
+            seniority=h.get("seniority", ""),
         ))
-    # rank and cut top_k
-    candidates.sort(key=lambda c: c.final_score, reverse=True)
-    return MatchResponse(results=candidates[:req.top_k])
+    return JobsResponse(employee_id=employee_id, results=jobs)
@@ -1,62 +1,169 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional, Tuple
+from datetime import datetime
 import uuid
 
-from ..core import extractor, cleaner, classifier, skill_extractor, experience_extractor, embedder, db_mongo, db_qdrant
+from ..core import pipeline, embedder, db_mongo, executors, export, extractor, ingest_queue, tracing
 
 router = APIRouter()
 
 class UploadResponse(BaseModel):
     employee_id: str
-    embedding_id: int
+    embedding_id: str
+    duplicate: bool = False  # same file content was already stored; existing ids returned
+
+
+class BatchItem(BaseModel):
+    filename: Optional[str] = None
+    status: str  # ok | duplicate | error
+    employee_id: Optional[str] = None
+    embedding_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    state: str
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    filename: Optional[str] = None
+    size: int = 0
+    state: str  # queued | running | done | dead
+    stage: Optional[str] = None  # download | dedup | analyze | embed | store while running
+    attempts: int = 0
+    timings: Dict[str, float] = {}  # seconds per finished stage of the current/last attempt
+    analysis: Optional[Dict[str, Dict[str, float]]] = None  # extractor/analyzer breakdown (stage seconds, events)
+    result: Optional[UploadResponse] = None
+    errors: List[Dict[str, Any]] = []
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    available_at: Optional[datetime] = None  # when a queued retry becomes runnable
+
+
+class BatchUploadResponse(BaseModel):
+    results: List[BatchItem]
+    processed: int
+    duplicates: int
+    failed: int
+    elapsed_sec: float
+    docs_per_sec: float
+
+
+async def read_upload(file: UploadFile) -> extractor.Source:
+    """Small uploads are read into memory; large or unsized ones are streamed to a spool file."""
+    if file.size is None or file.size > pipeline.SPOOL_THRESHOLD:
+        await file.seek(0)
+        return await executors.io.run(pipeline.spool, file.file)
+    return await file.read()
 
 
 @router.post("/upload-resume", response_model=UploadResponse)
 async def upload_resume(file: UploadFile = File(...)):
-    data = await file.read()
-    text, mime = extractor.extract(data)
-    if not text:
+    with tracing.stage("read_upload"):
+        source = await read_upload(file)
+    try:
+        with tracing.stage("dedup"):
+            digest, existing = await executors.io.run(pipeline.find_duplicate, source)
+        if existing:
+            dup = pipeline.DuplicateDocument(existing)
+            return UploadResponse(employee_id=dup.employee_id, embedding_id=dup.embedding_id, duplicate=True)
+        with tracing.stage("analyze"):
+            analysis = await executors.cpu.run(pipeline.analyze_document, source)
+            tracing.merge(analysis.pop("trace", None))
+            if "ocr_images" in analysis:
+                analysis = await executors.ocr.run(pipeline.complete_ocr, analysis)
+    finally:
+        pipeline.release([source])
+    if not analysis["raw_text"]:
         raise HTTPException(status_code=400, detail="Could not extract text")
-    cleaned = cleaner.clean_text(text)
-    sections = classifier.classify_sections(cleaned)
-    skills = skill_extractor.extract_skills(cleaned)
-    experience_years = experience_extractor.compute_years(cleaned)
+    analysis["content_hash"] = digest
 
     employee_id = str(uuid.uuid4())
-    vec = embedder.embed_text(cleaned)
-    embed_dim = len(vec)
-    db_qdrant.ensure_collection(embed_dim)
-    embedding_id = db_qdrant.upsert_embedding(employee_id, vec)
-
-    profile = {
-        "employee_id": employee_id,
-        "raw_text": text,
-        "cleaned_text": cleaned,
-        "sections": sections,
-        "skills": skills,
-        "experience_years": experience_years,
-        "embedding_id": embedding_id,
-        "mime": mime,
-        "filename": file.filename,
-    }
-    db_mongo.insert_resume(profile)
+    with tracing.stage("embed"):
+        vectors = await executors.embed.run(embedder.embed_texts, pipeline.embed_inputs(analysis))
+    try:
+        embedding_id = await executors.io.run(pipeline.store_document, employee_id, analysis, vectors, file.filename)
+    except pipeline.DuplicateDocument as dup:
+        return UploadResponse(employee_id=dup.employee_id, embedding_id=dup.embedding_id, duplicate=True)
     return UploadResponse(employee_id=employee_id, embedding_id=embedding_id)
 
 
+@router.post("/upload-async", response_model=JobAccepted, status_code=202)
+async def upload_async(file: UploadFile = File(...)):
+    """Store the file and queue it for an ingest worker; poll /resumes/jobs/{job_id} for the result."""
+    source = await read_upload(file)
+    try:
+        job = await executors.io.run(ingest_queue.enqueue, file.filename, source)
+    finally:
+        pipeline.release([source])
+    return JobAccepted(job_id=job["_id"], state=job["state"], status_url=f"/resumes/jobs/{job['_id']}")
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    job = await executors.io.run(ingest_queue.status, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatus(**job)
+
+
+@router.post("/upload-batch", response_model=BatchUploadResponse)
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """Ingest many resumes (individual files and/or ZIP archives) in one request."""
+    uploads: List[Tuple[Optional[str], extractor.Source]] = []
+    docs = []
+    try:
+        for f in files:
+            uploads.append((f.filename, await read_upload(f)))
+        docs = await executors.io.run(pipeline.expand_uploads, uploads)
+        if not docs:
+            raise HTTPException(status_code=400, detail="No files in upload")
+        summary = await executors.batch.run(pipeline.ingest_batch, docs)
+    finally:
+        pipeline.release([s for _, s in uploads] + [s for _, s in docs])
+    return BatchUploadResponse(**summary)
+
+
 @router.get("/profile/{employee_id}")
 async def get_profile(employee_id: str):
-    prof = db_mongo.get_resume_by_employee(employee_id)
+    prof = await executors.io.run(db_mongo.get_resume_by_employee, employee_id)
     if not prof:
         raise HTTPException(status_code=404, detail="Not found")
     prof.pop('_id', None)
     return prof
 
 
+@router.get("/export")
+async def export_resumes(format: Literal["ndjson", "zip"] = "ndjson", since: Optional[datetime] = None,
+                         until: Optional[datetime] = None, skills: Optional[str] = None, fields: Optional[str] = None,
+                         after: Optional[str] = None, limit: int = 0, batch_size: int = export.BATCH_SIZE):
+    """Stream all (or filtered) profiles; see core/export.py for the format and resume tokens.
+
+    ``skills`` and ``fields`` are comma-separated; ``fields=*`` exports whole documents.
+    """
+    try:
+        query = export.build_query(after, since, until, skills.split(",") if skills else None)
+    except export.InvalidToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    batch_size = max(1, min(batch_size, 10000))
+    cursor = db_mongo.iter_resumes(query, export.projection(field_list), batch_size, max(limit, 0))
+    if format == "zip":
+        return StreamingResponse(export.zip_stream(cursor, limit, batch_size), media_type="application/zip",
+                                 headers={"Content-Disposition": 'attachment; filename="resumes.zip"'})
+    return StreamingResponse(export.ndjson(cursor, limit, batch_size), media_type="application/x-ndjson")
+
+
 @router.get("/export/{employee_id}")
 async def export_resume(employee_id: str):
     """Simplified export: returns structured data. (Docx/PDF generation handled separately)."""
-    prof = db_mongo.get_resume_by_employee(employee_id)
+    prof = await executors.io.run(db_mongo.get_resume_by_employee, employee_id)
     if not prof:
         raise HTTPException(status_code=404, detail="Not found")
     prof.pop('_id', None)
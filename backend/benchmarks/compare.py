@@ -0,0 +1,57 @@
+"""Diff two benchmark result files.
+Run: python -m backend.benchmarks.compare old.json new.json [--threshold 10]
+
+Prints every latency/throughput metric with its relative change; changes beyond
+the threshold (percent) are flagged, and the exit code is 1 if any latency got
+slower or any throughput dropped by more than that.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+LOWER_IS_BETTER = ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("items_per_sec", "docs_per_sec", "requests_per_sec")
+
+
+def flatten(node: Any, prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    if isinstance(node, dict):
+        for k, v in node.items():
+            out.update(flatten(v, f"{prefix}.{k}" if prefix else k))
+    elif isinstance(node, list):
+        for item in node:
+            key = f"size={item['corpus_size']}" if isinstance(item, dict) and "corpus_size" in item else str(len(out))
+            out.update(flatten(item, f"{prefix}[{key}]"))
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        out[prefix] = float(node)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change flagged as a regression")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f:
+        old = flatten({k: v for k, v in json.load(f).items() if k != "meta"})
+    with open(args.new, encoding="utf-8") as f:
+        new = flatten({k: v for k, v in json.load(f).items() if k != "meta"})
+
+    regressions = 0
+    for key in sorted(set(old) & set(new)):
+        metric = key.rsplit(".", 1)[-1]
+        if metric not in LOWER_IS_BETTER + HIGHER_IS_BETTER or old[key] == 0:
+            continue
+        change = 100.0 * (new[key] - old[key]) / old[key]
+        worse = change > args.threshold if metric in LOWER_IS_BETTER else change < -args.threshold
+        regressions += worse
+        print(f"{'!' if worse else ' '} {key:70s} {old[key]:>12.3f} -> {new[key]:>12.3f} ({change:+.1f}%)")
+    for key in sorted(set(old) ^ set(new)):
+        print(f"  {key:70s} only in {'old' if key in old else 'new'}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Deterministic synthetic resumes and JDs for benchmarks.
+
+Resumes come in three formats: text-layer PDFs, scanned PDFs (pages rendered to
+images, so extraction goes through OCR) and DOCX. The same seed always yields
+the same corpus, so results are comparable between releases.
+"""
+import io
+import random
+from typing import Dict, List, Tuple
+
+FIRST_NAMES = ["Asha", "Ben", "Chen", "Diego", "Elif", "Farah", "Goran", "Hana", "Ivan", "Jun", "Kofi", "Lena"]
+LAST_NAMES = ["Rao", "Smith", "Li", "Garcia", "Yilmaz", "Khan", "Novak", "Sato", "Petrov", "Park", "Mensah", "Weber"]
+TITLES = ["Software Engineer", "Data Engineer", "Backend Developer", "DevOps Engineer", "Data Scientist",
+          "Frontend Developer", "Platform Engineer", "ML Engineer", "QA Engineer", "Solutions Architect"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella", "Stark Industries", "Wayne Enterprises", "Hooli", "Vandelay"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+DUTIES = [
+    "Designed and shipped services handling {n} requests per second using {a} and {b}.",
+    "Led a team of {n} engineers migrating legacy systems to {a}.",
+    "Built data pipelines in {a} feeding dashboards used by {n} analysts.",
+    "Reduced infrastructure cost by {n} percent by moving workloads to {a} and {b}.",
+    "Automated testing and deployment with {a}, cutting release time from days to hours.",
+    "Mentored junior developers and reviewed code across {a} and {b} repositories.",
+]
+FORMATS = ("pdf", "scanned", "docx")
+
+
+def _skill_pool() -> List[str]:
+    from ..core import skill_extractor
+    return sorted(skill_extractor.SKILL_DICT)
+
+
+def resume_text(rng: random.Random, pool: List[str], jobs: int = 3, filler: int = 2) -> str:
+    skills = rng.sample(pool, k=min(len(pool), rng.randint(4, 12)))
+    lines = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(TITLES), "",
+             "SUMMARY", f"{rng.choice(TITLES)} experienced in {', '.join(skills[:3])}.", "",
+             "SKILLS", ", ".join(s.title() for s in skills), "", "EXPERIENCE"]
+    year = 2024
+    for _ in range(jobs):
+        span = rng.randint(1, 5)
+        start = year - span
+        lines.append(f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)} "
+                     f"{rng.choice(MONTHS)} {start} - {rng.choice(MONTHS)} {year}")
+        for _ in range(filler + 1):
+            a, b = rng.sample(skills, 2)
+            lines.append("- " + rng.choice(DUTIES).format(n=rng.randint(2, 500), a=a.title(), b=b.title()))
+        year = start
+    lines += ["", "PROJECTS"]
+    for _ in range(filler):
+        a, b = rng.sample(skills, 2)
+        lines.append(f"- Side project built with {a.title()} and {b.title()}.")
+    lines += ["", "EDUCATION", f"B.Sc. Computer Science, {year - rng.randint(0, 3)}"]
+    return "\n".join(lines)
+
+
+def jd_text(rng: random.Random, pool: List[str]) -> str:
+    skills = rng.sample(pool, k=min(len(pool), rng.randint(3, 6)))
+    return (f"We are hiring a {rng.choice(TITLES)} at {rng.choice(COMPANIES)}. "
+            f"Minimum {rng.randint(1, 8)} years of experience. "
+            f"Must know {', '.join(s.title() for s in skills[:-1])} and {skills[-1].title()}. "
+            "You will design, build and operate production systems with a small team.")
+
+
+def to_pdf(text: str) -> bytes:
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+    return doc.tobytes()
+
+
+def to_scanned_pdf(text: str, dpi: int = 150) -> bytes:
+    """A PDF whose only page content is an image of the text (no text layer)."""
+    import fitz
+    pix = fitz.open("pdf", to_pdf(text))[0].get_pixmap(dpi=dpi)
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=pix.tobytes("png"))
+    return doc.tobytes()
+
+
+def to_docx(text: str) -> bytes:
+    from docx import Document
+    doc = Document()
+    for line in text.splitlines():
+        doc.add_paragraph(line)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+RENDERERS = {"pdf": to_pdf, "scanned": to_scanned_pdf, "docx": to_docx}
+
+
+def resumes(n: int, seed: int = 0, formats: Tuple[str, ...] = ("pdf",)) -> List[Dict[str, object]]:
+    """n resumes as {"name", "format", "text", "data"}, formats assigned round-robin."""
+    rng = random.Random(seed)
+    pool = _skill_pool()
+    out = []
+    for i in range(n):
+        fmt = formats[i % len(formats)]
+        text = resume_text(rng, pool)
+        ext = "docx" if fmt == "docx" else "pdf"
+        out.append({"name": f"resume_{i:06d}.{ext}", "format": fmt, "text": text, "data": RENDERERS[fmt](text)})
+    return out
+
+
+def jds(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    pool = _skill_pool()
+    return [jd_text(rng, pool) for _ in range(n)]
@@ -0,0 +1,283 @@
+"""Offline throughput/latency benchmarks for the ingestion stages and /match/run.
+Run: python -m backend.benchmarks.run [--sizes 100,1000] [--out results.json]
+
+Mongo is replaced by mongomock and Qdrant by the client's in-memory mode, so
+no services are needed. The embedding model in local_models/embeddings is used
+when present; ``--embedder hash`` (or a missing model) switches to a
+deterministic hashing encoder so the rest of the pipeline can still be timed.
+Scanned documents need PaddleOCR; stages that fail are reported, not fatal.
+
+Results are a single JSON document (stage timings, per-size ingest and match
+load numbers, environment) meant to be diffed between releases with
+``python -m backend.benchmarks.compare old.json new.json``.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from . import corpus
+
+STAGES = ("extract", "clean", "classify", "segment", "skills", "experience", "embed")
+
+
+class HashEncoder:
+    """Model stand-in: signed feature hashing of tokens into a normalized vector."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, show_progress_bar: bool = False, normalize_embeddings: bool = True):
+        from ..core import skill_extractor
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for tok in skill_extractor.tokenize(text):
+                h = zlib.crc32(tok.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+def summarize(samples: List[float], items: int = 0) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    s = sorted(samples)
+    total = sum(s)
+    out = {
+        "count": len(s),
+        "total_sec": round(total, 4),
+        "mean_ms": round(1000 * total / len(s), 3),
+        "p50_ms": round(1000 * s[len(s) // 2], 3),
+        "p95_ms": round(1000 * s[min(len(s) - 1, int(len(s) * 0.95))], 3),
+        "p99_ms": round(1000 * s[min(len(s) - 1, int(len(s) * 0.99))], 3),
+        "max_ms": round(1000 * s[-1], 3),
+        "stdev_ms": round(1000 * statistics.pstdev(s), 3),
+    }
+    if items:
+        out["items_per_sec"] = round(items / total, 2) if total > 0 else 0.0
+    return out
+
+
+def setup(embedder_kind: str) -> str:
+    """Point the storage modules at in-memory stand-ins and pick the embedding model."""
+    import mongomock
+    from qdrant_client import QdrantClient
+    from ..core import db_mongo, db_qdrant, embedder, lexical_index
+
+    db_mongo._client = mongomock.MongoClient()
+    db_mongo._db = db_mongo._client[db_mongo.DB_NAME]
+    db_qdrant._client = QdrantClient(":memory:")
+    db_qdrant._ensured.clear()
+    lexical_index._INDEX = lexical_index.LexicalIndex(tempfile.mkdtemp(prefix="bench-lexical-"))
+    if embedder_kind == "auto":
+        embedder_kind = "model" if os.path.exists(os.path.join(embedder.MODEL_PATH, "modules.json")) else "hash"
+    if embedder_kind == "hash":
+        embedder._MODEL = HashEncoder()
+        embedder._DIM = embedder._MODEL.dim
+    db_mongo.ensure_indexes()
+    return embedder_kind
+
+
+def reset_stores():
+    from ..core import db_mongo, db_qdrant, lexical_index
+    from qdrant_client import QdrantClient
+    for name in db_mongo.get_db().list_collection_names():
+        db_mongo.get_db().drop_collection(name)
+    db_mongo.ensure_indexes()
+    db_qdrant._client = QdrantClient(":memory:")
+    db_qdrant._ensured.clear()
+    lexical_index._INDEX = lexical_index.LexicalIndex(tempfile.mkdtemp(prefix="bench-lexical-"))
+
+
+def bench_stages(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Time every stage per document, in-process and without the embedding cache."""
+    from ..core import classifier, cleaner, embedder, experience_extractor, extractor, skill_extractor
+    from ..core.embed_cache import EmbeddingCache
+
+    saved_cache = embedder._CACHE
+    embedder._CACHE = EmbeddingCache(embedder.model_identity(), max_items=0, directory="")
+    timings: Dict[str, Dict[str, List[float]]] = {}
+    errors: Dict[str, int] = {}
+    cleaned_texts = []
+
+    def timed(stage: str, fmt: str, fn: Callable, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.setdefault(stage, {}).setdefault(fmt, []).append(time.perf_counter() - started)
+        return result
+
+    try:
+        for doc in docs:
+            fmt = doc["format"]
+            try:
+                text, _ = timed("extract", fmt, extractor.extract, doc["data"])
+            except Exception:
+                errors[f"extract/{fmt}"] = errors.get(f"extract/{fmt}", 0) + 1
+                continue
+            cleaned = timed("clean", fmt, cleaner.clean_text, text)
+            timed("classify", fmt, classifier.classify_sections, cleaned)
+            timed("segment", fmt, classifier.clean_and_segment, text)
+            timed("skills", fmt, skill_extractor.extract_skills, cleaned)
+            timed("experience", fmt, experience_extractor.compute_years, cleaned)
+            cleaned_texts.append(cleaned)
+        for text in cleaned_texts:
+            timed("embed", "single", embedder.embed_texts, [text])
+        for start in range(0, len(cleaned_texts), 32):
+            timed("embed", "batch32", embedder.embed_texts, cleaned_texts[start:start + 32])
+    finally:
+        embedder._CACHE = saved_cache
+
+    out: Dict[str, Any] = {}
+    for stage in STAGES:
+        per_fmt = timings.get(stage, {})
+        out[stage] = {}
+        for fmt, samples in per_fmt.items():
+            items = len(samples) if fmt != "batch32" else len(cleaned_texts)
+            out[stage][fmt] = summarize(samples, items)
+        every = [x for fmt, samples in per_fmt.items() if fmt != "batch32" for x in samples]
+        if stage != "embed":
+            out[stage]["all"] = summarize(every, len(every))
+    out["errors"] = errors
+    return out
+
+
+def bench_ingest(docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    from ..core import pipeline
+    started = time.perf_counter()
+    summary = pipeline.ingest_batch([(d["name"], d["data"]) for d in docs])
+    return {
+        "docs": len(docs),
+        "processed": summary["processed"],
+        "failed": summary["failed"],
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        "docs_per_sec": summary["docs_per_sec"],
+    }
+
+
+def bench_match(client, jd_texts: List[str], jd_ids: List[str], requests_per_mode: int, concurrency: int,
+                top_k: int) -> Dict[str, Any]:
+    rng = random.Random(7)
+    modes = {
+        "jd_text": lambda: {"jd_text": rng.choice(jd_texts), "top_k": top_k},
+        "jd_id": lambda: {"jd_id": rng.choice(jd_ids), "top_k": top_k, "use_cache": False},
+        "jd_id_cached": lambda: {"jd_id": rng.choice(jd_ids), "top_k": top_k},
+    }
+    lock = threading.Lock()
+    out = {}
+    for mode, body in modes.items():
+        bodies = [body() for _ in range(requests_per_mode)]
+        latencies: List[float] = []
+        failures = 0
+
+        def call(b):
+            nonlocal failures
+            started = time.perf_counter()
+            r = client.post("/match/run", json=b)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if r.status_code != 200:
+                    failures += 1
+
+        wall = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, bodies))
+        wall = time.perf_counter() - wall
+        stats = summarize(latencies)
+        stats.pop("total_sec", None)
+        stats.update({"failures": failures, "requests_per_sec": round(len(bodies) / wall, 2) if wall > 0 else 0.0})
+        out[mode] = stats
+    return out
+
+
+def bench_e2e(sizes: List[int], args) -> List[Dict[str, Any]]:
+    from fastapi.testclient import TestClient
+    from ..core import startup
+    from ..main import app
+
+    jd_texts = corpus.jds(args.jds, seed=args.seed + 1)
+    results = []
+    with TestClient(app) as client:
+        while not startup.ready():  # background storage setup must not race reset_stores()
+            time.sleep(0.05)
+        for size in sizes:
+            reset_stores()
+            docs = corpus.resumes(size, seed=args.seed + size, formats=("pdf", "docx"))
+            ingest = bench_ingest(docs)
+            jd_ids = [client.post("/jd/process-jd", json={"text": t}).json()["jd_id"] for t in jd_texts]
+            match = bench_match(client, jd_texts, jd_ids, args.requests, args.concurrency, args.top_k)
+            results.append({"corpus_size": size, "ingest": ingest, "match": match})
+            print(f"[e2e] {size} resumes: ingest {ingest['docs_per_sec']} docs/s, "
+                  f"match p50 {match['jd_id']['p50_ms']} ms", file=sys.stderr)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(__file__)).decode().strip()
+    except Exception:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume matcher benchmarks")
+    parser.add_argument("--sizes", default="100,1000", help="comma-separated corpus sizes for the e2e runs")
+    parser.add_argument("--stage-docs", type=int, default=30, help="documents per format for stage timings")
+    parser.add_argument("--formats", default="pdf,docx,scanned", help="formats for stage timings")
+    parser.add_argument("--jds", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="/match/run requests per mode and size")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedder", choices=("auto", "model", "hash"), default="auto")
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--out", default="-", help="output JSON path, - for stdout")
+    args = parser.parse_args()
+
+    embedder_kind = setup(args.embedder)
+    formats = tuple(f for f in args.formats.split(",") if f)
+    stage_docs = corpus.resumes(args.stage_docs * len(formats), seed=args.seed, formats=formats)
+    print(f"[stages] {len(stage_docs)} documents ({', '.join(formats)})", file=sys.stderr)
+    result = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedder": embedder_kind,
+            "args": vars(args),
+        },
+        "stages": bench_stages(stage_docs),
+        "e2e": [] if args.skip_e2e else bench_e2e([int(s) for s in args.sizes.split(",") if s], args),
+    }
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[done] Wrote {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Check that trie skill extraction finds everything the original word matcher found.
+Run: python -m backend.benchmarks.skills_regression [--n 500] [--seed 0]
+
+The original extractor split text with ``[A-Za-z][A-Za-z+.#]*`` and kept
+dictionary words, so "Python/Django" or "Java8" still yielded their skills.
+The corpus is the benchmark resumes and JDs, the same resumes with skills
+written the ways that tokenization handles differently (slash and dash joined,
+version suffixes), and a few fixed samples. Prints every document where the
+current extractor misses a skill the original found; a word of a longer skill
+that was matched ("spring" in "Spring Boot") is not a miss, and neither is a
+skill the taxonomy only accepts in context ("spring" on its own is a season).
+Exit code 1 if any.
+"""
+import argparse
+import random
+import re
+import sys
+from typing import List, Set
+
+from . import corpus
+from ..core import skill_extractor
+
+BASELINE_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z+.#]*")
+SAMPLES = [
+    "Python/Django, AWS/GCP, HTML/CSS, React/Redux",
+    "Local stacks with docker-compose and kubernetes-helm charts",
+    "Java8, Python3, python3.11, Angular2",
+    "TF (Terraform) modules for GCP",
+    "CI/CD with Jenkins; node.js/express APIs; scikit-learn models",
+    "Spring 2019 internship; served 500 ml doses; Spring Framework and Spring MVC services",
+]
+
+
+# Skills that are a taxonomy entry by themselves; the others need a longer phrase.
+STANDALONE = {s for s in skill_extractor.SKILL_DICT if skill_extractor.find_skills([s]) == [s]}
+
+
+def baseline(text: str) -> Set[str]:
+    """The original extractor: single-word dictionary skills among the text's words."""
+    words = {w.lower() for w in BASELINE_WORD_PATTERN.findall(text)}
+    return {s for s in STANDALONE if s in words}
+
+
+def current(text: str) -> Set[str]:
+    """Current skills, plus the words of multi-word ones ("spring boot" also covers "spring")."""
+    found = {s.lower() for s in skill_extractor.extract_skills(text)}
+    return found | {w for s in found for w in s.split()}
+
+
+def variants(rng: random.Random, pool: List[str], n: int) -> List[str]:
+    texts = []
+    for _ in range(n):
+        text = corpus.resume_text(rng, pool)
+        texts.append(text)
+        skills = rng.sample(pool, k=6)
+        texts.append("/".join(skills[:3]) + ", " + "-".join(skills[3:]))
+        texts.append(", ".join(f"{s}{rng.randint(2, 11)}" for s in skills))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare trie skill extraction with the original word matcher")
+    parser.add_argument("--n", type=int, default=500, help="generated resumes (each also in two rewritten forms)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pool = sorted(skill_extractor.SKILL_DICT)
+    texts = SAMPLES + variants(rng, pool, args.n) + corpus.jds(args.n // 5 or 1, args.seed + 1)
+    regressions = 0
+    found_old = found_new = 0
+    for text in texts:
+        old, new = baseline(text), current(text)
+        found_old += len(old)
+        found_new += len(skill_extractor.extract_skills(text))
+        missed = old - new
+        if missed:
+            regressions += 1
+            print(f"MISSED {sorted(missed)} in {text[:120]!r}")
+    print(f"{len(texts)} documents: original matcher {found_old} skills, current {found_new}, "
+          f"{regressions} documents with misses")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
+
+from . import cleaner
 
 SECTION_KEYWORDS = {
     "skills": ["skills", "technical skills", "core competencies"],
@@ -11,33 +13,95 @@ SECTION_KEYWORDS = {
     "contact": ["contact", "contact information", "personal details"],
 }
 
-HEADER_PATTERN = re.compile(r"^\s*(.+?)\s*$")
+# Header lines are short; ALL-CAPS lines or exact keywords are checked against the header prefixes.
+HEADER_MAX_LEN = 60
+HEADER_KEYWORDS = frozenset(k for keys in SECTION_KEYWORDS.values() for k in keys)
+# One alternation, in SECTION_KEYWORDS order, so the first section with a matching prefix wins.
+HEADER_RE = re.compile("|".join(
+    f"(?P<{sec}>{'|'.join(re.escape(k) for k in keys)})" for sec, keys in SECTION_KEYWORDS.items()))
 
+# Section -> (start, end) offsets of its runs of non-blank lines in the segmented text.
+Spans = Dict[str, List[Tuple[int, int]]]
 
-def classify_sections(text: str) -> Dict[str, str]:
-    lines = text.splitlines()
-    current_header = None
-    buckets: Dict[str, List[str]] = {k: [] for k in SECTION_KEYWORDS.keys()}
-
-    def match_section(header: str) -> str:
-        hl = header.lower()
-        for sec, keys in SECTION_KEYWORDS.items():
-            for k in keys:
-                if hl.startswith(k):
-                    return sec
+
+def match_header(line: str) -> str:
+    """Section named by a stripped line, or "" if the line is not a section header."""
+    if len(line) >= HEADER_MAX_LEN:
         return ""
+    lowered = line.lower()
+    if not (line.isupper() or lowered in HEADER_KEYWORDS):
+        return ""
+    m = HEADER_RE.match(lowered)
+    return m.lastgroup if m else ""
+
 
+def segment_lines(lines: Iterable[str]) -> Tuple[str, Spans]:
+    """Join lines into one text and record where each section's lines sit in it.
+
+    Header lines stay in the text but belong to no section; lines before the
+    first header are unassigned.
+    """
+    out: List[str] = []
+    spans: Spans = {}
+    current = ""
+    start = end = -1
+    pos = 0
     for line in lines:
-        line_clean = line.strip()
-        if not line_clean:
+        out.append(line)
+        line_start = pos
+        pos += len(line) + 1
+        stripped = line.strip()
+        sec = match_header(stripped) if stripped else ""
+        if not stripped or sec:
+            if start >= 0:
+                spans.setdefault(current, []).append((start, end))
+                start = -1
+            current = sec or current
             continue
-        # treat lines in ALLCAPS or short lines as potential headers
-        if (len(line_clean) < 60 and (line_clean.isupper() or line_clean.lower() in sum(SECTION_KEYWORDS.values(), []))):
-            sec = match_section(line_clean)
-            if sec:
-                current_header = sec
-                continue
-        if current_header:
-            buckets[current_header].append(line)
-
-    return {k: "\n".join(v).strip() for k, v in buckets.items() if v}
+        if current:
+            if start < 0:
+                start = line_start
+            end = line_start + len(line)
+    if start >= 0:
+        spans.setdefault(current, []).append((start, end))
+    return "\n".join(out), spans
+
+
+def clean_and_segment(raw: str) -> Tuple[str, Spans]:
+    """cleaner.clean_text and section spans from a single pass over the lines of raw."""
+    return segment_lines(cleaner.clean_lines(raw))
+
+
+def section_texts(text: str, spans: Spans) -> Dict[str, str]:
+    """Materialize each section's text from its spans."""
+    out = {}
+    for sec in SECTION_KEYWORDS:
+        if sec in spans:
+            out[sec] = "\n".join(text[s:e] for s, e in spans[sec]).strip()
+    return out
+
+
+def classify_sections(text: str) -> Dict[str, str]:
+    return section_texts(*segment_lines(text.splitlines()))
+
+
+# Sections embedded as separate chunks; contact details carry no matching signal.
+CHUNK_SECTIONS = ("summary", "skills", "experience", "projects", "education", "certifications")
+
+
+def chunk_sections(sections: Dict[str, str], fallback_text: str = "", max_words: int = 180,
+                   overlap: int = 30) -> List[Dict[str, str]]:
+    """Split sections into windows of at most max_words words, overlapping by overlap words.
+
+    Text without any recognised section is chunked as a single "body" section.
+    """
+    sources: List[Tuple[str, str]] = [(s, sections[s]) for s in CHUNK_SECTIONS if sections.get(s)]
+    if not sources and fallback_text.strip():
+        sources = [("body", fallback_text)]
+    step = max(max_words - overlap, 1)
+    chunks: List[Dict[str, str]] = []
+    for section, text in sources:
+        words = text.split()
+        for start in range(0, max(len(words) - overlap, 1), step):
+            chunks.append({"section": section, "text": " ".join(words[start:start + max_words])})
+    return chunks
@@ -1,34 +1,39 @@
 import re
-from typing import List
-
-HEADER_FOOTER_PAT = re.compile(r"(^Page \d+ of \d+)|(^\s*Page \d+\s*$)", re.IGNORECASE | re.MULTILINE)
-PAGE_NUMBER_PAT = re.compile(r"\n?\s*\d+\s*\n")
-MULTISPACE = re.compile(r"[ \t]{2,}")
-SYMBOLS = re.compile(r"[•■▪▶★✦–—]+")
-
-
-def remove_headers_footers(text: str) -> str:
-    return HEADER_FOOTER_PAT.sub(" ", text)
-
-
-def remove_page_numbers(text: str) -> str:
-    return PAGE_NUMBER_PAT.sub(" \n", text)
-
-
-def remove_symbols(text: str) -> str:
-    return SYMBOLS.sub(" ", text)
-
-
-def normalize_whitespace(text: str) -> str:
-    text = MULTISPACE.sub(" ", text)
-    text = re.sub(r"\r", "\n", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
+from typing import Iterator
+
+# Running page headers ("Page 2 of 5 ...") are cut from the start of a line; lines holding
+# nothing but a page marker ("Page 3", "3") are dropped.
+PAGE_PREFIX = re.compile(r"page\s+\d+\s+of\s+\d+\b", re.IGNORECASE)
+PAGE_LINE = re.compile(r"(?:page\s+)?\d+", re.IGNORECASE)
+# Bullet/decoration symbols and runs of spaces/tabs both become a single space.
+SPACING = re.compile(r"[ \t]*(?:[•■▪▶★✦–—]+[ \t]*)+|[ \t]{2,}")
+
+
+def clean_lines(raw: str) -> Iterator[str]:
+    """Normalized lines of raw text in one pass; runs of blank lines collapse to one ''."""
+    blank = False
+    emitted = False
+    for line in raw.splitlines():
+        if "  " in line or "\t" in line or not line.isascii():  # plain lines skip the regex scan
+            line = SPACING.sub(" ", line)
+        line = line.strip()
+        if line and (line[0].isdigit() or line[0] in "pP"):
+            if PAGE_LINE.fullmatch(line):
+                continue
+            m = PAGE_PREFIX.match(line)
+            if m:
+                line = line[m.end():].lstrip()
+                if not line:
+                    continue
+        if not line:
+            blank = emitted
+            continue
+        if blank:
+            yield ""
+            blank = False
+        emitted = True
+        yield line
 
 
 def clean_text(raw: str) -> str:
-    t = remove_headers_footers(raw)
-    t = remove_page_numbers(t)
-    t = remove_symbols(t)
-    t = normalize_whitespace(t)
-    return t
+    return "\n".join(clean_lines(raw))
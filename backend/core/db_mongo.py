@@ -1,10 +1,17 @@
 from typing import Dict, Any, Optional, List
 import os
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME = os.getenv("MONGO_DB", "resume_matcher")
 
+# Fields needed to score a candidate; avoids shipping raw/cleaned text per hit.
+SCORING_PROJECTION = {"_id": 0, "employee_id": 1, "skills": 1, "experience_years": 1, "sections.summary": 1}
+
+DUPLICATE_KEY = 11000
+DEDUP_PROJECTION = {"_id": 0, "employee_id": 1, "embedding_id": 1, "content_hash": 1}
+
 _client: Optional[MongoClient] = None
 _db = None
 
@@ -17,12 +24,45 @@ def get_db():
     return _db
 
 
+def ensure_indexes():
+    db = get_db()
+    db.resumes.create_index("employee_id", unique=True)
+    # partial, so profiles stored before hashing was added do not collide on a missing field
+    db.resumes.create_index("content_hash", unique=True,
+                            partialFilterExpression={"content_hash": {"$type": "string"}})
+    db.resumes.create_index("skills")  # export filters
+    db.job_descriptions.create_index("jd_id", unique=True)
+    db.match_results.create_index("key", unique=True)
+    db.match_results.create_index("model_id")
+    db.match_results.create_index("expire_at", expireAfterSeconds=0)
+    # ingestion queue (core/ingest_queue.py): claim scans, dead-letter listing, expiry of finished jobs
+    db.ingest_jobs.create_index([("state", 1), ("available_at", 1)])
+    db.ingest_jobs.create_index([("state", 1), ("lease_until", 1)])
+    db.ingest_jobs.create_index([("state", 1), ("finished_at", -1)])
+    db.ingest_jobs.create_index("expire_at", expireAfterSeconds=0)
+
+
 def insert_resume(profile: Dict[str, Any]) -> str:
     db = get_db()
     res = db.resumes.insert_one(profile)
     return str(res.inserted_id)
 
 
+def insert_resumes(profiles: List[Dict[str, Any]]) -> List[int]:
+    """Insert many profiles; returns the positions rejected as duplicates (unique index)."""
+    if not profiles:
+        return []
+    db = get_db()
+    try:
+        db.resumes.insert_many(profiles, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        return [err["index"] for err in errors]
+    return []
+
+
 def update_resume(query: Dict[str, Any], update: Dict[str, Any]):
     db = get_db()
     db.resumes.update_one(query, {"$set": update})
@@ -34,11 +74,44 @@ def insert_jd(jd: Dict[str, Any]) -> str:
     return str(res.inserted_id)
 
 
-def list_resumes() -> List[Dict[str, Any]]:
+def get_jd(jd_id: str, with_text: bool = False) -> Optional[Dict[str, Any]]:
+    db = get_db()
+    return db.job_descriptions.find_one({"jd_id": jd_id}, {"_id": 0} if with_text else {"_id": 0, "raw_text": 0})
+
+
+def get_jds(jd_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch many JDs (without their text) in one round-trip, keyed by jd_id."""
+    if not jd_ids:
+        return {}
     db = get_db()
-    return list(db.resumes.find())
+    return {jd["jd_id"]: jd for jd in db.job_descriptions.find({"jd_id": {"$in": list(jd_ids)}}, {"_id": 0, "raw_text": 0})}
+
+
+def iter_resumes(query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 500, limit: int = 0):
+    """Server-side cursor over profiles in _id order, fetched batch_size documents at a time."""
+    db = get_db()
+    return db.resumes.find(query or {}, projection).sort("_id", 1).batch_size(batch_size).limit(limit)
 
 
 def get_resume_by_employee(employee_id: str) -> Optional[Dict[str, Any]]:
     db = get_db()
     return db.resumes.find_one({"employee_id": employee_id})
+
+
+def get_resumes_by_hashes(hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Already stored documents among the given content hashes, keyed by hash."""
+    if not hashes:
+        return {}
+    db = get_db()
+    cursor = db.resumes.find({"content_hash": {"$in": list(hashes)}}, DEDUP_PROJECTION)
+    return {doc["content_hash"]: doc for doc in cursor}
+
+
+def get_resumes_by_employees(employee_ids: List[str], projection: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Fetch many profiles in one round-trip, keyed by employee_id."""
+    if not employee_ids:
+        return {}
+    db = get_db()
+    cursor = db.resumes.find({"employee_id": {"$in": list(employee_ids)}}, projection or SCORING_PROJECTION)
+    return {doc["employee_id"]: doc for doc in cursor}
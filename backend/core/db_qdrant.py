@@ -1,13 +1,48 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
 import os
+import time
+import uuid
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 
+from . import skill_extractor
+
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "resumes")
+JD_COLLECTION_NAME = os.getenv("QDRANT_JD_COLLECTION", "job_descriptions")
+CHUNK_COLLECTION_NAME = os.getenv("QDRANT_CHUNK_COLLECTION", "resume_chunks")
+# Per-section chunk vectors, searched alongside the whole-document vector (max-sim).
+CHUNKS_ENABLED = os.getenv("EMBED_CHUNKS", "1") not in ("0", "false", "no")
+# Chunk hits fetched per requested candidate; several chunks of one resume can rank high.
+CHUNK_HITS_PER_CANDIDATE = int(os.getenv("MATCH_CHUNK_HITS", "4"))
+
+SCORING_FIELDS = ("skills", "experience_years", "summary")
+# Payload fields indexed for filtered search.
+PAYLOAD_INDEXES = {
+    "skills": models.PayloadSchemaType.KEYWORD,
+    "experience_years": models.PayloadSchemaType.FLOAT,
+}
+CHUNK_PAYLOAD_INDEXES = {**PAYLOAD_INDEXES, "employee_id": models.PayloadSchemaType.KEYWORD}
+JD_FIELDS = ("skills", "min_experience", "seniority")
+JD_PAYLOAD_INDEXES = {
+    "skills": models.PayloadSchemaType.KEYWORD,
+    "min_experience": models.PayloadSchemaType.FLOAT,
+}
+
+# Deterministic point ids: stable across workers and restarts. Points written
+# before this used 31-bit integer ids, which Mongo still references.
+POINT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "resume-matcher/points")
+PointId = Union[int, str]
+
+# Writes through an alias are refused once it points to another collection than when this
+# process set it up: a re-embedding job swapped in vectors from another model.
+ALIAS_CHECK_SECONDS = float(os.getenv("QDRANT_ALIAS_CHECK_SECONDS", "10"))
 
 _client: QdrantClient = None
+_ensured = set()
+_bound: Dict[str, str] = {}  # alias -> collection it pointed to at ensure_collection()
+_resolved: Dict[str, Tuple[str, float]] = {}  # alias -> (collection, monotonic time it was looked up)
 
 
 def get_client() -> QdrantClient:
@@ -17,32 +52,330 @@ def get_client() -> QdrantClient:
     return _client
 
 
-def ensure_collection(vector_size: int):
+class DimensionMismatch(RuntimeError):
+    """A collection holds vectors of another size than the current embedding model produces."""
+
+
+class AliasMoved(RuntimeError):
+    """The alias was switched to re-embedded vectors; this process still runs the previous model."""
+
+
+def collection_vector_size(name: str) -> Optional[int]:
+    """Vector size of a collection (or alias), None if it does not exist."""
+    client = get_client()
+    if not client.collection_exists(name):
+        return None
+    return client.get_collection(name).config.params.vectors.size
+
+
+def resolve_alias(alias: str) -> Optional[str]:
+    """Collection an alias points to, None if ``alias`` is not an alias."""
+    for a in get_client().get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def versioned_name(name: str, version: int) -> str:
+    return f"{name}_v{version}"
+
+
+def create_collection(name: str, vector_size: int, indexes: Optional[Dict[str, Any]] = None):
+    """Create a physical collection with its payload indexes (no-op if it exists with that size)."""
     client = get_client()
-    if COLLECTION_NAME not in [c.name for c in client.get_collections().collections]:
-        client.recreate_collection(
-            collection_name=COLLECTION_NAME,
+    existing = collection_vector_size(name)
+    if existing is None:
+        client.create_collection(
+            collection_name=name,
             vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE)
         )
+    elif existing != vector_size:
+        raise DimensionMismatch(f"Collection {name} has {existing}-d vectors, expected {vector_size}")
+    for field, schema in (PAYLOAD_INDEXES if indexes is None else indexes).items():
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
+
+
+def switch_aliases(targets: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Point each alias at its collection in one atomic request; returns the previous targets.
+
+    A physical collection still using an alias's name (created before
+    collections were versioned) is dropped first, so that switch is not atomic.
+    """
+    client = get_client()
+    previous: Dict[str, Optional[str]] = {}
+    ops: List[Any] = []
+    for alias, collection in targets.items():
+        previous[alias] = resolve_alias(alias)
+        if previous[alias] is not None:
+            ops.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+        elif client.collection_exists(alias):
+            client.delete_collection(alias)
+        ops.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=ops)
+    _ensured.difference_update(targets)
+    return previous
+
+
+def ensure_collection(vector_size: int, name: str = COLLECTION_NAME, indexes: Optional[Dict[str, Any]] = None):
+    """Make ``name`` usable: created as ``<name>_v1`` behind an alias, or checked against the model's size.
+
+    Raises DimensionMismatch when the existing vectors have another size
+    (a different embedding model); see scripts/reindex_embeddings.py.
+    """
+    if name in _ensured:
+        return
+    client = get_client()
+    existing = collection_vector_size(name)
+    if existing is None:
+        physical = versioned_name(name, 1)
+        create_collection(physical, vector_size, indexes)
+        switch_aliases({name: physical})
+    elif existing != vector_size:
+        raise DimensionMismatch(
+            f"Collection {name} has {existing}-d vectors but the embedding model produces {vector_size}-d; "
+            "re-embed with python -m backend.scripts.reindex_embeddings")
+    else:
+        physical = resolve_alias(name) or name
+        for field, schema in (PAYLOAD_INDEXES if indexes is None else indexes).items():
+            client.create_payload_index(collection_name=physical, field_name=field, field_schema=schema)
+    _bound.setdefault(name, physical)
+    _ensured.add(name)
+
+
+def check_writable(name: str):
+    """Raise AliasMoved if alias ``name`` no longer points where it did at ensure_collection().
+
+    The alias is looked up at most every ALIAS_CHECK_SECONDS; collections
+    written by their physical name (the re-embedding job) are not checked.
+    """
+    bound = _bound.get(name)
+    if bound is None:
+        return
+    current, at = _resolved.get(name, (bound, float("-inf")))
+    if time.monotonic() - at >= ALIAS_CHECK_SECONDS:
+        current = resolve_alias(name) or name
+        _resolved[name] = (current, time.monotonic())
+    if current != bound:
+        raise AliasMoved(f"{name} now serves {current} (was {bound}); restart on the re-embedded model")
+
+
+def serving(name: str) -> str:
+    """Collection to query for alias ``name``: the one it pointed to at ensure_collection().
+
+    After a re-embedding job switches the alias, this process keeps searching
+    the vectors of the model it runs until it is restarted on the new one.
+    (A legacy collection that used the alias's own name is dropped by the
+    switch, so there the alias is all that is left.)
+    """
+    return _bound.get(name, name)
+
+
+def ensure_jd_collection(vector_size: int):
+    ensure_collection(vector_size, JD_COLLECTION_NAME, JD_PAYLOAD_INDEXES)
+
+
+def ensure_chunk_collection(vector_size: int):
+    ensure_collection(vector_size, CHUNK_COLLECTION_NAME, CHUNK_PAYLOAD_INDEXES)
+
+
+def point_id(employee_id: str) -> str:
+    """Qdrant point id of a resume's whole-document vector."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"resume:{employee_id}"))
+
+
+def _chunk_point_id(employee_id: str, index: int) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, f"chunk:{employee_id}:{index}"))
+
+
+def upsert_embedding(employee_id: str, vector: List[float], payload: Optional[Dict[str, Any]] = None) -> str:
+    return upsert_embeddings([(employee_id, vector)], [payload or {}])[0]
+
 
+def upsert_embeddings(items: List[Tuple[str, List[float]]], payloads: Optional[List[Dict[str, Any]]] = None,
+                      collection: str = COLLECTION_NAME) -> List[str]:
+    """Bulk upsert (employee_id, vector) pairs in a single request.
 
-def upsert_embedding(employee_id: str, vector: List[float]) -> int:
+    ``payloads`` carries the scoring fields (skills, experience_years, summary)
+    so a match can be answered from the vector search alone.
+    """
+    check_writable(collection)
     client = get_client()
-    point_id = hash(employee_id) & 0x7FFFFFFF
+    payloads = payloads or [{} for _ in items]
+    point_ids = [point_id(employee_id) for employee_id, _ in items]
     client.upsert(
-        collection_name=COLLECTION_NAME,
-        points=[models.PointStruct(id=point_id, vector=vector, payload={"employee_id": employee_id})]
+        collection_name=collection,
+        points=[
+            models.PointStruct(id=point_id, vector=vector, payload={**extra, "employee_id": employee_id})
+            for point_id, (employee_id, vector), extra in zip(point_ids, items, payloads)
+        ]
     )
-    return point_id
+    return point_ids
 
 
-def search(vector: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+def upsert_chunks(items: List[Tuple[str, List[Dict[str, str]], List[List[float]], Dict[str, Any]]],
+                  collection: str = CHUNK_COLLECTION_NAME):
+    """Bulk upsert section chunks as (employee_id, chunks, vectors, payload) in one request.
+
+    The filterable payload fields are copied onto every chunk point so hard
+    filters apply to chunk search too.
+    """
+    check_writable(collection)
+    filters = {f: None for f in PAYLOAD_INDEXES}
+    points = []
+    for employee_id, chunks, vectors, payload in items:
+        extra = {k: v for k, v in payload.items() if k in filters}
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
+            points.append(models.PointStruct(
+                id=_chunk_point_id(employee_id, i),
+                vector=vector,
+                payload={**extra, "employee_id": employee_id, "section": chunk["section"], "chunk": i},
+            ))
+    if points:
+        get_client().upsert(collection_name=collection, points=points)
+
+
+def delete_resumes(employee_ids: List[str]):
+    """Remove the document and chunk points of the given resumes."""
+    if not employee_ids:
+        return
+    client = get_client()
+    client.delete(collection_name=COLLECTION_NAME,
+                  points_selector=models.PointIdsList(points=[point_id(e) for e in employee_ids]))
+    if CHUNKS_ENABLED:
+        client.delete(collection_name=CHUNK_COLLECTION_NAME, points_selector=models.FilterSelector(
+            filter=models.Filter(must=[models.FieldCondition(key="employee_id", match=models.MatchAny(any=list(employee_ids)))])))
+
+
+def set_payload(point_id: PointId, payload: Dict[str, Any]):
+    client = get_client()
+    client.set_payload(collection_name=COLLECTION_NAME, payload=payload, points=[point_id])
+
+
+def existing_points(ids: List[PointId], collection: str = COLLECTION_NAME) -> Set[str]:
+    """The given point ids that are stored in ``collection``."""
+    if not ids:
+        return set()
+    points = get_client().retrieve(collection_name=collection, ids=ids, with_vectors=False, with_payload=False)
+    return {str(p.id) for p in points}
+
+
+def get_vector(point_id: PointId) -> Optional[List[float]]:
+    """Stored vector of a resume point, so it can be queried without re-encoding."""
     client = get_client()
-    results = client.search(collection_name=COLLECTION_NAME, query_vector=vector, limit=top_k)
+    points = client.retrieve(collection_name=serving(COLLECTION_NAME), ids=[point_id], with_vectors=True, with_payload=False)
+    return list(points[0].vector) if points else None
+
+
+def upsert_jds(items: List[Tuple[str, List[float]]], payloads: List[Dict[str, Any]],
+               collection: str = JD_COLLECTION_NAME):
+    """Bulk upsert (jd_id, vector) pairs. jd_ids are UUIDs and double as point ids."""
+    check_writable(collection)
+    client = get_client()
+    client.upsert(
+        collection_name=collection,
+        points=[
+            models.PointStruct(id=jd_id, vector=vector, payload={**extra, "jd_id": jd_id})
+            for (jd_id, vector), extra in zip(items, payloads)
+        ]
+    )
+
+
+def build_filter(must_skills: Optional[List[str]] = None, min_years: Optional[float] = None) -> Optional[models.Filter]:
+    """Hard requirements pushed down into the vector search.
+
+    Skill names go through the extractor's alias map, as stored skills did.
+    """
+    must = [models.FieldCondition(key="skills", match=models.MatchValue(value=s))
+            for s in skill_extractor.canonical_skills(must_skills or [])]
+    if min_years:
+        must.append(models.FieldCondition(key="experience_years", range=models.Range(gte=min_years)))
+    return models.Filter(must=must) if must else None
+
+
+def _restrict(query_filter: Optional[models.Filter], condition) -> models.Filter:
+    if query_filter is None:
+        return models.Filter(must=[condition])
+    return models.Filter(must=list(query_filter.must) + [condition])
+
+
+def search(vector: List[float], top_k: int = 5, must_skills: Optional[List[str]] = None,
+           min_years: Optional[float] = None, employee_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Nearest resumes; ``employee_ids`` limits the search to those resumes."""
+    client = get_client()
+    query_filter = build_filter(must_skills, min_years)
+    if employee_ids is not None:
+        query_filter = _restrict(query_filter, models.HasIdCondition(has_id=[point_id(e) for e in employee_ids]))
+    results = client.search(
+        collection_name=serving(COLLECTION_NAME),
+        query_vector=vector,
+        query_filter=query_filter,
+        limit=top_k,
+    )
+    out = []
+    for r in results:
+        hit = {k: v for k, v in r.payload.items() if k in SCORING_FIELDS}
+        hit.update({"employee_id": r.payload.get("employee_id"), "score": r.score})
+        out.append(hit)
+    return out
+
+
+def search_chunks(vector: List[float], top_k: int = 5, must_skills: Optional[List[str]] = None,
+                  min_years: Optional[float] = None, employee_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Best chunk per candidate among the nearest chunk points, as search() hits plus ``section``."""
+    client = get_client()
+    query_filter = build_filter(must_skills, min_years)
+    if employee_ids is not None:
+        query_filter = _restrict(query_filter, models.FieldCondition(
+            key="employee_id", match=models.MatchAny(any=list(employee_ids))))
+    results = client.search(
+        collection_name=serving(CHUNK_COLLECTION_NAME),
+        query_vector=vector,
+        query_filter=query_filter,
+        limit=top_k * CHUNK_HITS_PER_CANDIDATE,
+    )
+    best: Dict[str, Dict[str, Any]] = {}
+    for r in results:  # sorted by score, so the first chunk seen per candidate is its max
+        employee_id = r.payload.get("employee_id")
+        if employee_id not in best:
+            best[employee_id] = {"employee_id": employee_id, "score": r.score, "section": r.payload.get("section")}
+    return list(best.values())[:top_k]
+
+
+def search_max_sim(vector: List[float], top_k: int = 5, must_skills: Optional[List[str]] = None,
+                   min_years: Optional[float] = None, employee_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Whole-document and chunk search merged; a candidate scores its best-matching vector.
+
+    With ``employee_ids`` only those resumes are scored (e.g. lexical hits the
+    vector search did not return), so top_k should be len(employee_ids).
+    """
+    hits = {h["employee_id"]: h for h in search(vector, top_k, must_skills, min_years, employee_ids)}
+    if CHUNKS_ENABLED:
+        for c in search_chunks(vector, top_k, must_skills, min_years, employee_ids):
+            h = hits.get(c["employee_id"])
+            if h is None:
+                hits[c["employee_id"]] = c
+            elif c["score"] > h["score"]:
+                h.update(score=c["score"], section=c["section"])
+    return sorted(hits.values(), key=lambda h: -h["score"])[:top_k]
+
+
+def search_jds(vector: List[float], top_k: int = 5, max_min_experience: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Nearest JDs to a candidate vector; optionally only JDs whose minimum experience is met."""
+    client = get_client()
+    query_filter = None
+    if max_min_experience is not None:
+        query_filter = models.Filter(must=[
+            models.FieldCondition(key="min_experience", range=models.Range(lte=max_min_experience))])
+    results = client.search(
+        collection_name=serving(JD_COLLECTION_NAME),
+        query_vector=vector,
+        query_filter=query_filter,
+        limit=top_k,
+    )
     out = []
     for r in results:
-        out.append({
-            "employee_id": r.payload.get("employee_id"),
-            "score": r.score
-        })
+        hit = {k: v for k, v in r.payload.items() if k in JD_FIELDS}
+        hit.update({"jd_id": r.payload.get("jd_id"), "score": r.score})
+        out.append(hit)
     return out
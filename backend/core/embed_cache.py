@@ -0,0 +1,183 @@
+"""Content-addressed embedding cache.
+
+Keys are sha256(model identity + whitespace-normalized text), so a resume or
+JD that has been embedded before is never re-encoded. Two tiers:
+
+- an in-memory LRU bounded by EMBED_CACHE_SIZE entries;
+- an optional on-disk tier under EMBED_CACHE_DIR: float32 vectors appended to
+  ``vectors.f32`` (read back through a memory map) and ``keys.idx`` lines of
+  ``<key> <row>``. It survives restarts and is namespaced per model identity.
+  Several processes may share the directory: appends are serialized with a
+  file lock, and each process reads the key lines others appended when the
+  file has grown (on a miss, and before it appends).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import metrics
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "")
+
+HITS = metrics.counter("embed_cache_hits", "Embedding lookups served from cache")
+DISK_HITS = metrics.counter("embed_cache_disk_hits", "Embedding lookups served from the on-disk tier")
+MISSES = metrics.counter("embed_cache_misses", "Embedding lookups that required encoding")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+class _LRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+            return vec
+
+    def put(self, key: str, vec: List[float]):
+        if self.max_items <= 0:
+            return
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _DiskStore:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.keys_path = os.path.join(directory, "keys.idx")
+        self.dim: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._keys_offset = 0  # bytes of keys.idx already in _index
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        """Add the key lines appended (by any process) since the last call."""
+        try:
+            if os.path.getsize(self.keys_path) <= self._keys_offset:
+                return
+            with open(self.keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1  # a line still being written is read next time
+        for line in data[:end].decode("ascii", "replace").splitlines():
+            parts = line.split()
+            if len(parts) == 3:  # <key> <row> <dim>; partial lines from a crash are skipped
+                self._index[parts[0]] = int(parts[1])
+                self.dim = int(parts[2])
+        self._keys_offset += end
+
+    def _mapped_rows(self) -> int:
+        return 0 if self._mm is None else self._mm.shape[0]
+
+    def _remap(self):
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows = size // (4 * self.dim) if self.dim else 0
+        self._mm = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+
+    def get(self, key: str) -> Optional[List[float]]:
+        row = self._index.get(key)
+        with self._lock:
+            if row is None:
+                self._load_index()
+                row = self._index.get(key)
+                if row is None:
+                    return None
+            if row >= self._mapped_rows():
+                self._remap()
+            if row >= self._mapped_rows():
+                return None
+            return np.array(self._mm[row]).tolist()
+
+    def put(self, key: str, vec: List[float]):
+        arr = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            if key in self._index or (self.dim is not None and arr.shape[0] != self.dim):
+                return
+            with open(self.vectors_path, "ab") as vf, open(self.keys_path, "a", encoding="ascii") as kf:
+                if fcntl is not None:
+                    fcntl.flock(vf, fcntl.LOCK_EX)
+                try:
+                    self._load_index()  # another process may have stored it meanwhile
+                    if key in self._index:
+                        return
+                    row = vf.seek(0, os.SEEK_END) // (4 * arr.shape[0])
+                    vf.write(arr.tobytes())
+                    vf.flush()
+                    # unread bytes under the lock are a line torn by a crash: end it first
+                    torn = os.path.getsize(self.keys_path) > self._keys_offset
+                    kf.write(("\n" if torn else "") + f"{key} {row} {arr.shape[0]}\n")
+                    kf.flush()  # before unlocking, so the next writer sees the key
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(vf, fcntl.LOCK_UN)
+            self.dim = arr.shape[0]
+            self._index[key] = row
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class EmbeddingCache:
+    def __init__(self, model_id: str, max_items: int = MEMORY_ITEMS, directory: str = CACHE_DIR):
+        self.model_id = model_id
+        self._memory = _LRU(max_items)
+        self._disk = _DiskStore(os.path.join(directory, model_id[:16])) if directory else None
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256()
+        h.update(self.model_id.encode("utf-8"))
+        h.update(b"\0")
+        h.update(normalize(text).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vec = self._memory.get(key)
+        if vec is None and self._disk is not None:
+            vec = self._disk.get(key)
+            if vec is not None:
+                DISK_HITS.inc()
+                self._memory.put(key, vec)
+        (HITS if vec is not None else MISSES).inc()
+        return vec
+
+    def put(self, key: str, vec: List[float]):
+        self._memory.put(key, vec)
+        if self._disk is not None:
+            self._disk.put(key, vec)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "memory_items": len(self._memory),
+            "disk_items": len(self._disk) if self._disk is not None else 0,
+            "hits": HITS.value,
+            "disk_hits": DISK_HITS.value,
+            "misses": MISSES.value,
+        }
@@ -1,33 +1,226 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from . import executors, metrics
+from .embed_cache import EmbeddingCache
 
 _MODEL = None
+_CACHE: Optional[EmbeddingCache] = None
+_DIM: Optional[int] = int(os.getenv("EMBEDDING_DIM", "0")) or None
+
+MODEL_PATH = os.getenv("EMBED_MODEL_PATH") or os.path.join(os.path.dirname(__file__), "..", "local_models", "embeddings")
+# torch: SentenceTransformer; onnx / onnx-int8: exported artifact on ONNX Runtime (see onnx_backend.py)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+# Concurrent embed_text calls arriving within this window share one forward pass.
+BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+# Weights hashed into model_identity(), as saved by transformers / sentence-transformers.
+WEIGHT_FILES = ["model.safetensors", "pytorch_model.bin"]
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "local_models", "embeddings")
+BATCH_SIZE_HIST = metrics.histogram(
+    "embedder_batch_size", [1, 2, 4, 8, 16, 32, 64, 128], "Texts per micro-batched forward pass")
+QUEUE_WAIT_HIST = metrics.histogram(
+    "embedder_queue_wait_seconds", [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0],
+    "Time an embed_text call waited before its batch started encoding")
 
 
-def get_model() -> SentenceTransformer:
+def get_model():
     global _MODEL
     if _MODEL is None:
         # Assumes local model directory contains necessary files
-        _MODEL = SentenceTransformer(MODEL_PATH)
+        if EMBED_BACKEND == "torch":
+            from sentence_transformers import SentenceTransformer
+            _MODEL = SentenceTransformer(MODEL_PATH)
+        elif EMBED_BACKEND in ("onnx", "onnx-int8"):
+            from . import onnx_backend
+            _MODEL = onnx_backend.OnnxEncoder(
+                MODEL_PATH, onnx_backend.artifact_path(MODEL_PATH, quantized=EMBED_BACKEND == "onnx-int8"))
+        else:
+            raise ValueError(f"Unknown EMBED_BACKEND: {EMBED_BACKEND}")
     return _MODEL
 
 
+def use_model(path: str):
+    """Switch to the model in ``path`` before it is loaded; the vector size and cache follow it."""
+    global MODEL_PATH, _DIM, _CACHE
+    MODEL_PATH = path
+    _DIM = None
+    _CACHE = None
+
+
+def set_cache(cache: EmbeddingCache):
+    """Replace the embedding cache, e.g. with a disabled one for a job that encodes every text once."""
+    global _CACHE
+    _CACHE = cache
+
+
+def model_identity() -> str:
+    """Fingerprint of the local model files, computed without loading the model.
+
+    Covers the weights, so a fine-tuned model with an unchanged config gets a
+    new identity (and fresh embedding and match caches). Hashing them reads the
+    files once, about a second per GB.
+    """
+    h = hashlib.sha256(os.path.basename(os.path.normpath(MODEL_PATH)).encode("utf-8"))
+    names = ["config.json", "modules.json", "config_sentence_transformers.json", "tokenizer.json"]
+    if EMBED_BACKEND == "torch":
+        names += WEIGHT_FILES
+    else:
+        from . import onnx_backend
+        names.append(os.path.relpath(onnx_backend.artifact_path(MODEL_PATH, quantized=EMBED_BACKEND == "onnx-int8"),
+                                     MODEL_PATH))
+    for name in names:
+        path = os.path.join(MODEL_PATH, name)
+        if os.path.exists(path):
+            h.update(name.encode("utf-8"))
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+    if EMBED_BACKEND != "torch":
+        # quantized vectors differ slightly, so they get their own cache namespace
+        h.update(EMBED_BACKEND.encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_cache() -> EmbeddingCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = EmbeddingCache(model_identity())
+    return _CACHE
+
+
+class _MicroBatcher:
+    """Collects concurrent single-text requests and encodes them together."""
+
+    def __init__(self, window_s: float, max_batch: int):
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                    self._thread.start()
+        fut: Future = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_s
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            BATCH_SIZE_HIST.observe(len(batch))
+            for _, _, enqueued in batch:
+                QUEUE_WAIT_HIST.observe(started - enqueued)
+            live = [(text, fut) for text, fut, _ in batch if fut.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                vecs = get_model().encode([t for t, _ in live], show_progress_bar=False, normalize_embeddings=True)
+            except Exception as e:
+                for _, fut in live:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(live, vecs):
+                fut.set_result(vec.tolist())
+
+
+_BATCHER = _MicroBatcher(BATCH_WINDOW_MS / 1000.0, MAX_BATCH)
+
+
+def submit_text(text: str) -> Future:
+    """Queue text for the next micro-batch; the future resolves to its vector.
+
+    Cached texts resolve immediately without touching the model. With batching
+    off the text is encoded on the embed pool, never in the caller's thread
+    (the event loop, under executors.embed.admit()).
+    """
+    cache = get_cache()
+    key = cache.key(text)
+    cached = cache.get(key)
+    if cached is not None:
+        fut: Future = Future()
+        fut.set_result(cached)
+        return fut
+    if BATCH_WINDOW_MS <= 0:
+        # the raw pool: the caller's admit() already holds this task's slot
+        return executors.embed.executor.submit(_embed_one, text)
+
+    def _store(f: Future):
+        if not f.cancelled() and f.exception() is None:
+            cache.put(key, f.result())
+
+    fut = _BATCHER.submit(text)
+    fut.add_done_callback(_store)
+    return fut
+
+
+def _embed_one(text: str) -> List[float]:
+    return embed_texts([text])[0]
+
+
 def embed_text(text: str) -> List[float]:
-    model = get_model()
-    vec = model.encode(text, show_progress_bar=False, normalize_embeddings=True)
-    return vec.tolist()
+    return submit_text(text).result()
 
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
-    model = get_model()
-    vecs = model.encode(texts, show_progress_bar=False, normalize_embeddings=True)
-    return [v.tolist() for v in vecs]
+    cache = get_cache()
+    keys = [cache.key(t) for t in texts]
+    found: Dict[str, List[float]] = {}
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key in found or key in missing:
+            continue
+        vec = cache.get(key)
+        if vec is None:
+            missing[key] = text
+        else:
+            found[key] = vec
+    if missing:
+        model = get_model()
+        vecs = model.encode(list(missing.values()), show_progress_bar=False, normalize_embeddings=True)
+        for key, v in zip(missing.keys(), vecs):
+            found[key] = v.tolist()
+            cache.put(key, found[key])
+    return [found[k] for k in keys]
+
+
+def is_loaded() -> bool:
+    return _MODEL is not None
 
 
 def embedding_dimension() -> int:
-    model = get_model()
-    return model.get_sentence_embedding_dimension()
+    """Vector size from EMBEDDING_DIM or the model's pooling config; loads the model only as a last resort."""
+    global _DIM
+    if _DIM is None:
+        path = os.path.join(MODEL_PATH, "1_Pooling", "config.json")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                _DIM = json.load(f).get("word_embedding_dimension")
+        if _DIM is None:
+            _DIM = get_model().get_sentence_embedding_dimension()
+    return _DIM
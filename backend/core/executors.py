@@ -0,0 +1,185 @@
+"""Bounded executors that keep blocking work off the event loop.
+
+Each kind of work has its own pool so heavy ingestion cannot starve
+latency-sensitive queries:
+
+  cpu   - process pool for extraction, OCR and text analysis
+  embed - thread pool for the in-process embedding model
+  io    - thread pool for Mongo/Qdrant calls
+  ocr   - thread pool finishing documents whose scanned pages the cpu workers
+          rendered (pipeline.complete_ocr); the pages themselves are
+          recognized on the one OCR process pool (extractor.get_ocr_pool)
+  batch - thread pool driving /resumes/upload-batch requests
+          (pipeline.ingest_batch); a driver only waits on the other pools and
+          holds none of their slots, so batches cannot starve each other
+
+Every pool admits at most ``workers + queue`` outstanding tasks. Async
+handlers are rejected with ``Overloaded`` (served as HTTP 429) once that limit
+is reached; synchronous callers such as the batch pipeline can instead block
+until a slot frees up. A process pool whose worker died is replaced on the
+next submit.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import BrokenExecutor, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from . import metrics, tika_client
+
+
+class Overloaded(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"{name} executor is at capacity")
+        self.name = name
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, factory: Callable[[int], Executor], workers: int, queue: int):
+        self.name = name
+        self.workers = workers
+        self.capacity = workers + queue
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._cond:
+                if self._executor is None:
+                    self._executor = self._factory(self.workers)
+        return self._executor
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _acquire(self, block: bool):
+        with self._cond:
+            while self._pending >= self.capacity:
+                if not block:
+                    raise Overloaded(self.name)
+                self._cond.wait()
+            self._pending += 1
+
+    def _release(self, _fut=None):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify()
+
+    def submit(self, fn: Callable, *args, block: bool = True, **kwargs) -> Future:
+        """Submit from synchronous code; blocks while the pool is full unless block=False."""
+        self._acquire(block)
+        try:
+            fut = self._submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        fut.add_done_callback(self._release)
+        return fut
+
+    def _submit(self, fn: Callable, *args, **kwargs) -> Future:
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenExecutor:
+            # a worker died (e.g. OOM-killed): the tasks it had fail, later ones get a new pool
+            self._replace(executor)
+            return self.executor.submit(fn, *args, **kwargs)
+
+    def _replace(self, broken: Executor):
+        with self._cond:
+            if self._executor is broken:
+                self._executor = None
+                metrics.counter("executor_restarts", "Pools recreated after a worker died", {"executor": self.name}).inc()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Await fn(*args, **kwargs) on this pool; raises Overloaded if the queue is full.
+
+        Thread pools run the call in a copy of the caller's context, so request
+        tracing (core.tracing) carries over; process pools cannot.
+        """
+        call = functools.partial(fn, *args, **kwargs)
+        if not isinstance(self.executor, ProcessPoolExecutor):
+            call = functools.partial(contextvars.copy_context().run, call)
+        fut = self.submit(call, block=False)
+        return await asyncio.wrap_future(fut)
+
+    async def admit(self, start: Callable[..., Future], *args, **kwargs) -> Any:
+        """Await the future returned by start(...) under this pool's admission limit.
+
+        For work that schedules itself (e.g. the embedding micro-batcher) instead
+        of occupying one of the pool's threads.
+        """
+        self._acquire(False)
+        try:
+            fut = start(*args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        fut.add_done_callback(self._release)
+        return await asyncio.wrap_future(fut)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+_CPUS = os.cpu_count() or 1
+
+cpu = BoundedExecutor(
+    "cpu",
+    # workers share the parent's Tika request cap, whatever the start method
+    lambda n: ProcessPoolExecutor(max_workers=n, initializer=tika_client.use_slots, initargs=(tika_client.slots,)),
+    _env_int("EXEC_CPU_WORKERS", _CPUS),
+    _env_int("EXEC_CPU_QUEUE", 4 * _CPUS),
+)
+embed = BoundedExecutor(
+    "embed",
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="embed"),
+    _env_int("EXEC_EMBED_WORKERS", 2),
+    _env_int("EXEC_EMBED_QUEUE", 64),
+)
+io = BoundedExecutor(
+    "io",
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="io"),
+    _env_int("EXEC_IO_WORKERS", 16),
+    _env_int("EXEC_IO_QUEUE", 256),
+)
+
+ocr = BoundedExecutor(
+    "ocr",
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="ocr"),
+    _env_int("EXEC_OCR_WORKERS", min(4, _CPUS)),
+    _env_int("EXEC_OCR_QUEUE", 64),
+)
+
+batch = BoundedExecutor(
+    "batch",
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="batch"),
+    _env_int("EXEC_BATCH_WORKERS", 2),
+    _env_int("EXEC_BATCH_QUEUE", 2),
+)
+
+ALL = (cpu, embed, io, ocr, batch)
+
+for _ex in ALL:
+    metrics.gauge("executor_pending", "Tasks running or queued on the pool", {"executor": _ex.name},
+                  fn=lambda ex=_ex: ex.pending)
+    metrics.gauge("executor_capacity", "Admission limit of the pool", {"executor": _ex.name},
+                  fn=lambda ex=_ex: ex.capacity)
+
+
+def shutdown_all():
+    for ex in ALL:
+        ex.shutdown()
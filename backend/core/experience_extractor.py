@@ -6,6 +6,9 @@ MONTHS = "jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec|january|february|
 DATE_RANGE = re.compile(rf"((?:{MONTHS})\.?\s+\d{{4}})\s*-\s*((?:{MONTHS})\.?\s+\d{{4}}|present|current)", re.IGNORECASE)
 YEAR_SPAN = re.compile(r"(\d+(?:\.\d+)?)\s+years?\s+of\s+experience", re.IGNORECASE)
 SINGLE_YEAR = re.compile(r"(\d{4})")
+# Minimum experience a JD asks for: "minimum N years", else the first "N years".
+MIN_YEARS = re.compile(r"minimum\s+(\d+(?:\.\d+)?)\+?\s+years", re.IGNORECASE)
+ANY_YEARS = re.compile(r"(\d+(?:\.\d+)?)\+?\s+years", re.IGNORECASE)
 
 MONTH_NUM = {
     'jan':1,'feb':2,'mar':3,'apr':4,'may':5,'jun':6,'jul':7,'aug':8,'sep':9,'sept':9,'oct':10,'nov':11,'dec':12,
@@ -57,3 +60,9 @@ def compute_years(text: str) -> float:
         if span > 0:
             return float(span)
     return 0.0
+
+
+def required_years(jd_text: str) -> float:
+    """Minimum years of experience a JD asks for (0.0 if it names none)."""
+    m = MIN_YEARS.search(jd_text) or ANY_YEARS.search(jd_text)
+    return float(m.group(1)) if m else 0.0
@@ -0,0 +1,146 @@
+"""Streaming bulk export of stored profiles as NDJSON or ZIP.
+
+Profiles are read from one server-side cursor in ``_id`` order, ``batch_size``
+documents per round-trip, and written out as they arrive, so memory does not
+grow with the collection. Every record carries ``cursor``, an opaque token:
+passing it back as ``after`` (with the same filters) resumes right after that
+record, e.g. when a nightly sync is interrupted. The stream ends with a trailer
+(NDJSON: a final ``{"export": ...}`` line, ZIP: ``manifest.json``) holding the
+record count and, when ``limit`` cut the export short, the token to continue.
+"""
+import base64
+import binascii
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from . import skill_extractor
+
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Records per NDJSON part inside a ZIP export; keeps the ZIP directory small.
+ZIP_PART_RECORDS = int(os.getenv("EXPORT_ZIP_PART_RECORDS", "10000"))
+# Exported unless ``fields`` says otherwise; raw and cleaned text are large and opt-in.
+DEFAULT_FIELDS = ("employee_id", "filename", "mime", "skills", "experience_years", "sections", "embedding_id",
+                  "content_hash")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(oid: ObjectId) -> str:
+    return base64.urlsafe_b64encode(oid.binary).rstrip(b"=").decode("ascii")
+
+
+def decode_token(token: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise InvalidToken(f"invalid export token: {token!r}")
+
+
+def build_query(after: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                skills: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Mongo filter for an export; the time bounds use the creation time in ``_id``.
+
+    ``skills`` are matched as /match/run matches them ("K8s" is Kubernetes),
+    exactly against the stored form, so the index on ``skills`` applies.
+    """
+    id_range: Dict[str, Any] = {}
+    if since is not None:
+        id_range["$gte"] = ObjectId.from_datetime(since)
+    if until is not None:
+        id_range["$lt"] = ObjectId.from_datetime(until)
+    if after:
+        id_range["$gt"] = decode_token(after)
+    query: Dict[str, Any] = {"_id": id_range} if id_range else {}
+    # stored as extract_skills() writes them
+    wanted = [s.capitalize() for s in skill_extractor.canonical_skills(skills or [])]
+    if wanted:
+        query["skills"] = {"$all": wanted}
+    return query
+
+
+def projection(fields: Optional[List[str]] = None) -> Optional[Dict[str, int]]:
+    """``["*"]`` exports whole documents; ``_id`` is always read for the resume token."""
+    if fields == ["*"]:
+        return None
+    return {"_id": 1, **{f: 1 for f in (fields or DEFAULT_FIELDS)}}
+
+
+def _record(doc: Dict[str, Any]) -> bytes:
+    doc["cursor"] = encode_token(doc.pop("_id"))
+    return json.dumps(doc, default=str, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _trailer(count: int, last: Optional[ObjectId], limit: int) -> Dict[str, Any]:
+    return {"count": count, "next": encode_token(last) if limit and count >= limit and last else None}
+
+
+def ndjson(cursor, limit: int = 0, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    """One profile per line, then the trailer line; yields once per batch_size records."""
+    count, last, buf = 0, None, []
+    try:
+        for doc in cursor:
+            last = doc["_id"]
+            buf.append(_record(doc))
+            count += 1
+            if len(buf) >= batch_size:
+                yield b"".join(buf)
+                buf.clear()
+        buf.append(json.dumps({"export": _trailer(count, last, limit)}).encode("utf-8") + b"\n")
+        yield b"".join(buf)
+    finally:
+        cursor.close()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, unseekable stream whose contents are drained after each write burst."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_stream(cursor, limit: int = 0, batch_size: int = BATCH_SIZE,
+               part_records: int = ZIP_PART_RECORDS) -> Iterator[bytes]:
+    """A ZIP of NDJSON parts (``profiles-00001.ndjson``, ...) plus ``manifest.json``, built as it streams."""
+    sink = _Sink()
+    count, last = 0, None
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            part = None
+            for doc in cursor:
+                if part is None or count % part_records == 0:
+                    if part is not None:
+                        part.close()
+                    part = zf.open(f"profiles-{count // part_records + 1:05d}.ndjson", "w", force_zip64=True)
+                last = doc["_id"]
+                part.write(_record(doc))
+                count += 1
+                if count % batch_size == 0:
+                    yield sink.drain()
+            if part is not None:
+                part.close()
+            zf.writestr("manifest.json", json.dumps(_trailer(count, last, limit)))
+        yield sink.drain()
+    finally:
+        cursor.close()
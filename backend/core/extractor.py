@@ -1,12 +1,17 @@
 import io
 import fitz  # PyMuPDF
-from paddleocr import PaddleOCR
 import magic
 from docx import Document
-import subprocess
-import tempfile
+import mmap
 import os
-from typing import Tuple
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple, Union
+
+from . import tika_client, tracing
 
 try:
     from tika import parser as tika_parser  # type: ignore
@@ -14,6 +19,29 @@ except Exception:  # pragma: no cover
     tika_parser = None
 
 _OCR = None
+_OCR_POOL: Optional[ProcessPoolExecutor] = None
+# Set by deferred_ocr(): images needing OCR are collected here instead of being recognized.
+_DEFERRED: ContextVar[Optional[List[bytes]]] = ContextVar("deferred_ocr", default=None)
+OCR_PLACEHOLDER = "\x00ocr:{}\x00"
+_PLACEHOLDER_RE = re.compile("\x00ocr:(\\d+)\x00")
+
+_CPUS = os.cpu_count() or 1
+# Pages with fewer characters than this in their text layer are OCR'd (if they contain images).
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "20"))
+# Processes in the OCR pool, each holding its own PaddleOCR instance. There is one pool, in the
+# process that owns the executors; extraction workers hand their pages to it (see deferred_ocr()).
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, _CPUS))))
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", str(max(1, _CPUS // max(1, OCR_WORKERS)))))
+# Pages are rendered so their long side is about this many pixels, within the DPI bounds below.
+OCR_TARGET_PX = int(os.getenv("OCR_TARGET_PX", "2500"))
+OCR_MIN_DPI = 150
+OCR_MAX_DPI = 300
+
+# Only the header is handed to libmagic; DOCX vs plain ZIP is settled from the archive listing.
+MIME_SNIFF_BYTES = 8192
+
+# In-memory bytes/memoryview, or a path to a file that is opened/memory-mapped in place.
+Source = Union[bytes, bytearray, memoryview, str]
 
 PDF_MIME = "application/pdf"
 DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -23,82 +51,197 @@ IMAGE_MIMES = {"image/jpeg", "image/png"}
 def get_ocr():
     global _OCR
     if _OCR is None:
+        # Imported here so API and extraction workers only pay for paddle when a page needs OCR
+        from paddleocr import PaddleOCR
         # Assumes PaddleOCR models placed under backend/local_models/ocr if custom, else default download
-        _OCR = PaddleOCR(use_angle_cls=True, lang='en')
+        _OCR = PaddleOCR(use_angle_cls=True, lang='en', cpu_threads=OCR_CPU_THREADS)
     return _OCR
 
 
-def detect_mime(data: bytes) -> str:
-    return magic.from_buffer(data, mime=True)
-
-
-def extract_pdf_text(data: bytes) -> str:
-    doc = fitz.open(stream=data, filetype='pdf')
-    text_parts = []
-    for page in doc:
-        text = page.get_text("text")
-        if text:
-            text_parts.append(text)
-    full_text = "\n".join(text_parts).strip()
-    # Heuristic: if too little text, treat as scanned and OCR
-    if len(full_text) < 100:
-        images_text = []
-        for page_index in range(len(doc)):
-            page = doc[page_index]
-            pix = page.get_pixmap(dpi=300)
-            img_bytes = pix.tobytes("png")
-            ocr = get_ocr()
-            result = ocr.ocr(io.BytesIO(img_bytes))
-            page_text = " ".join([line[1][0] for line in result[0]]) if result else ""
-            images_text.append(page_text)
-        return "\n".join(images_text)
-    return full_text
-
-
-def extract_docx_text(data: bytes) -> str:
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp:
-        tmp.write(data)
-        tmp_path = tmp.name
+def _init_ocr_worker():
+    get_ocr()
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    global _OCR_POOL
+    if _OCR_POOL is None:
+        _OCR_POOL = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=_init_ocr_worker)
+    return _OCR_POOL
+
+
+@contextmanager
+def deferred_ocr() -> Iterator[List[bytes]]:
+    """Collect the images that need OCR instead of recognizing them in this process.
+
+    Their text is left as placeholders; recognize() the collected images in the
+    pool owner and put the results in with fill_ocr().
+    """
+    images: List[bytes] = []
+    token = _DEFERRED.set(images)
     try:
-        doc = Document(tmp_path)
-        return "\n".join(p.text for p in doc.paragraphs)
+        yield images
     finally:
-        os.unlink(tmp_path)
+        _DEFERRED.reset(token)
+
+
+def _defer(img_bytes: bytes) -> Optional[str]:
+    pending = _DEFERRED.get()
+    if pending is None:
+        return None
+    pending.append(img_bytes)
+    return OCR_PLACEHOLDER.format(len(pending) - 1)
+
+
+def recognize(images: List[bytes]) -> List[str]:
+    """OCR images in parallel on the OCR pool."""
+    return list(get_ocr_pool().map(ocr_image, images)) if images else []
+
 
+def fill_ocr(text: str, texts: List[str]) -> str:
+    return _PLACEHOLDER_RE.sub(lambda m: texts[int(m.group(1))], text)
 
-def extract_image_text(data: bytes) -> str:
-    ocr = get_ocr()
-    result = ocr.ocr(io.BytesIO(data))
-    if not result:
+
+def ocr_image(img_bytes: bytes) -> str:
+    result = get_ocr().ocr(io.BytesIO(img_bytes))
+    if not result or not result[0]:
         return ""
     return " ".join([line[1][0] for line in result[0]])
 
 
-def extract_with_tika(data: bytes) -> str:
+def render_dpi(page) -> int:
+    """DPI that renders the page's long side at roughly OCR_TARGET_PX pixels."""
+    long_side_in = max(page.rect.width, page.rect.height) / 72.0
+    if long_side_in <= 0:
+        return OCR_MAX_DPI
+    return int(min(OCR_MAX_DPI, max(OCR_MIN_DPI, OCR_TARGET_PX / long_side_in)))
+
+
+def _render_png(page) -> bytes:
+    return page.get_pixmap(dpi=render_dpi(page)).tobytes("png")
+
+
+def detect_mime(data: Union[bytes, memoryview], path: Optional[str] = None) -> str:
+    header = bytes(data[:MIME_SNIFF_BYTES])
+    mime = magic.from_buffer(header, mime=True)
+    if header[:2] == b"PK" and mime != DOCX_MIME:
+        try:
+            with zipfile.ZipFile(path or io.BytesIO(data)) as zf:
+                if "word/document.xml" in zf.namelist():
+                    return DOCX_MIME
+        except zipfile.BadZipFile:
+            pass
+    return mime
+
+
+def extract_pdf_text(data: Source) -> str:
+    """Text layer per page; only pages without one (scanned images) are rendered and OCR'd.
+
+    Under deferred_ocr() the pages are only rendered. Otherwise they are OCR'd
+    in parallel on the OCR pool while later pages are still being rendered; a
+    single scanned page is OCR'd in-process.
+    """
+    doc = fitz.open(data, filetype='pdf') if isinstance(data, str) else fitz.open(stream=data, filetype='pdf')
+    with doc:
+        with tracing.stage("pdf"):
+            texts: List[str] = []
+            scanned: List[int] = []
+            for page_index, page in enumerate(doc):
+                text = page.get_text("text") or ""
+                texts.append(text)
+                if len(text.strip()) < OCR_MIN_PAGE_CHARS and page.get_images():
+                    scanned.append(page_index)
+        if scanned:
+            tracing.count("ocr_pages", len(scanned))
+            with tracing.stage("ocr"):
+                _ocr_pages(doc, scanned, texts)
+    return "\n".join(t for t in texts if t).strip()
+
+
+def _ocr_pages(doc, scanned: List[int], texts: List[str]):
+    if _DEFERRED.get() is not None:
+        for page_index in scanned:
+            texts[page_index] = _defer(_render_png(doc[page_index]))
+        return
+    if len(scanned) == 1 or OCR_WORKERS <= 1:
+        for page_index in scanned:
+            texts[page_index] = ocr_image(_render_png(doc[page_index]))
+        return
+    pool = get_ocr_pool()
+    futures = [(page_index, pool.submit(ocr_image, _render_png(doc[page_index]))) for page_index in scanned]
+    for page_index, fut in futures:
+        texts[page_index] = fut.result()
+
+
+def extract_docx_text(data: Source) -> str:
+    with tracing.stage("docx"):
+        doc = Document(data if isinstance(data, str) else io.BytesIO(data))
+        return "\n".join(p.text for p in doc.paragraphs)
+
+
+def extract_image_text(data: Union[bytes, memoryview]) -> str:
+    tracing.count("ocr_pages")
+    placeholder = _defer(bytes(data))
+    if placeholder is not None:
+        return placeholder
+    with tracing.stage("ocr"):
+        return ocr_image(bytes(data))
+
+
+def extract_with_tika(data: Union[bytes, memoryview]) -> str:
+    tracing.count("tika_fallbacks")
+    with tracing.stage("tika"):
+        return _tika_text(data)
+
+
+def _tika_text(data: Union[bytes, memoryview]) -> str:
+    if tika_client.enabled():
+        # TikaUnavailable propagates: the document is not unreadable, the server is (for now)
+        return tika_client.parse(data).strip()
     if tika_parser is None:
         return ""
-    parsed = tika_parser.from_buffer(data)
+    parsed = tika_parser.from_buffer(bytes(data))
     return (parsed.get('content') or '').strip()
 
 
-def extract(data: bytes) -> Tuple[str, str]:
-    """Return (text, mime) given file bytes."""
-    mime = detect_mime(data)
+def extract_file(path: str) -> Tuple[str, str]:
+    """extract() for a spooled upload: the file is memory-mapped, never read into RAM whole."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "", detect_mime(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return extract(view, path=path)
+            finally:
+                view.release()
+
+
+def extract(data: Union[bytes, memoryview], path: Optional[str] = None) -> Tuple[str, str]:
+    """Return (text, mime) given file bytes.
+
+    When ``path`` is given (data is then a view of that file), PDF and DOCX
+    parsers open the file directly instead of the buffer.
+    """
+    with tracing.stage("mime"):
+        mime = detect_mime(data, path)
     text = ""
     try:
         if mime == PDF_MIME:
-            text = extract_pdf_text(data)
+            text = extract_pdf_text(path or data)
         elif mime == DOCX_MIME:
-            text = extract_docx_text(data)
+            text = extract_docx_text(path or data)
         elif mime in IMAGE_MIMES:
             text = extract_image_text(data)
         else:
             # Fallback try PyMuPDF if pdf signature
-            if data[:4] == b'%PDF':
-                text = extract_pdf_text(data)
+            if bytes(data[:4]) == b'%PDF':
+                text = extract_pdf_text(path or data)
             else:
                 text = extract_with_tika(data)
+    except tika_client.TikaUnavailable:
+        raise
     except Exception as e:  # pragma: no cover
+        tracing.count("parser_errors")
         # final fallback
         if not text:
             text = extract_with_tika(data)
@@ -0,0 +1,267 @@
+"""Durable ingestion queue: uploads are accepted at once and processed by separate workers.
+
+POST /resumes/upload-async stores the file in GridFS (bucket ``ingest_uploads``)
+and a job document in ``ingest_jobs``, then returns 202 with the job id.
+Workers (python -m backend.scripts.ingest_worker, any number of processes on
+any number of hosts) claim jobs with an atomic find-and-modify that sets a
+lease. While a job runs its worker renews the lease; if the worker dies, the
+job becomes claimable again once the lease expires. Failed attempts are
+retried with exponential backoff. After INGEST_MAX_ATTEMPTS (or at once, for
+files with no extractable text) the job is parked as ``dead`` with its file
+kept, until requeue() puts it back.
+
+  queued -> running -> done
+                    -> queued (retry, after a backoff)
+                    -> dead
+
+``stage`` and ``timings`` report progress for GET /resumes/jobs/{id}; finished
+jobs expire after INGEST_JOB_TTL_SECONDS. A retry after a crash between storing
+the profile and completing the job reports the stored profile as a duplicate.
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import gridfs
+from pymongo import ReturnDocument
+
+from . import db_mongo, db_qdrant, embedder, executors, extractor, pipeline
+
+LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "120"))
+MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+# Delay before the first retry; doubles with every further attempt.
+RETRY_SECONDS = float(os.getenv("INGEST_RETRY_SECONDS", "30"))
+JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+JOBS = "ingest_jobs"
+BUCKET = "ingest_uploads"
+# Fields returned by status(); the rest is bookkeeping.
+STATUS_FIELDS = ("filename", "size", "state", "stage", "attempts", "timings", "analysis", "result", "errors",
+                 "created_at", "started_at", "finished_at", "available_at")
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and another worker claimed it."""
+
+
+class Rejected(Exception):
+    """The document can never be ingested (e.g. no extractable text); retrying is pointless."""
+
+
+def _jobs():
+    return db_mongo.get_db()[JOBS]
+
+
+def _bucket() -> gridfs.GridFSBucket:
+    return gridfs.GridFSBucket(db_mongo.get_db(), bucket_name=BUCKET)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(filename: Optional[str], source: extractor.Source) -> Dict[str, Any]:
+    """Store the upload and queue a job for it; returns the job document."""
+    job_id = str(uuid.uuid4())
+    if isinstance(source, str):
+        size = os.path.getsize(source)
+        with open(source, "rb") as f:
+            file_id = _bucket().upload_from_stream(filename or job_id, f, metadata={"job_id": job_id})
+    else:
+        size = len(source)
+        file_id = _bucket().upload_from_stream(filename or job_id, source, metadata={"job_id": job_id})
+    now = _now()
+    job = {
+        "_id": job_id,
+        "filename": filename,
+        "file_id": file_id,
+        "size": size,
+        "state": "queued",
+        "stage": None,
+        "attempts": 0,
+        "timings": {},
+        "errors": [],
+        "available_at": now,
+        "created_at": now,
+    }
+    _jobs().insert_one(job)
+    return job
+
+
+def status(job_id: str) -> Optional[Dict[str, Any]]:
+    job = _jobs().find_one({"_id": job_id}, {f: 1 for f in STATUS_FIELDS})
+    if job is not None:
+        job["job_id"] = job.pop("_id")
+    return job
+
+
+def claim(worker_id: str) -> Optional[Dict[str, Any]]:
+    """Lease the oldest runnable job: queued and due, or running with an expired lease."""
+    now = _now()
+    return _jobs().find_one_and_update(
+        {"$or": [{"state": "queued", "available_at": {"$lte": now}},
+                 {"state": "running", "lease_until": {"$lt": now}}]},
+        {"$set": {"state": "running", "worker": worker_id, "lease_until": now + timedelta(seconds=LEASE_SECONDS),
+                  "started_at": now, "stage": None, "timings": {}},
+         "$inc": {"attempts": 1}},
+        sort=[("available_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _update(job: Dict[str, Any], update: Dict[str, Any]):
+    """Apply an update to a job this worker still holds; raises LeaseLost otherwise."""
+    res = _jobs().update_one({"_id": job["_id"], "state": "running", "worker": job["worker"],
+                              "attempts": job["attempts"]}, update)
+    if not res.matched_count:
+        raise LeaseLost(job["_id"])
+
+
+def heartbeat(job: Dict[str, Any]):
+    _update(job, {"$set": {"lease_until": _now() + timedelta(seconds=LEASE_SECONDS)}})
+
+
+def complete(job: Dict[str, Any], result: Dict[str, Any], timings: Dict[str, float]):
+    now = _now()
+    _update(job, {"$set": {"state": "done", "stage": None, "result": result, "timings": timings, "finished_at": now,
+                           "expire_at": now + timedelta(seconds=JOB_TTL_SECONDS)},
+                  "$unset": {"lease_until": "", "file_id": ""}})
+    try:
+        _bucket().delete(job["file_id"])
+    except gridfs.errors.NoFile:
+        pass
+
+
+def fail(job: Dict[str, Any], error: str, timings: Dict[str, float], retry: bool = True):
+    """Record a failed attempt: queue a retry with backoff, or park the job as dead."""
+    now = _now()
+    entry = {"attempt": job["attempts"], "stage": job.get("stage"), "error": error, "at": now}
+    if retry and job["attempts"] < MAX_ATTEMPTS:
+        update = {"state": "queued", "available_at": now + timedelta(seconds=RETRY_SECONDS * 2 ** (job["attempts"] - 1))}
+    else:
+        update = {"state": "dead", "finished_at": now}
+    _update(job, {"$set": {**update, "timings": timings}, "$unset": {"lease_until": ""}, "$push": {"errors": entry}})
+
+
+def requeue(job_ids: Optional[List[str]] = None) -> int:
+    """Put dead jobs (all, or the given ones) back in the queue with fresh attempts."""
+    query: Dict[str, Any] = {"state": "dead"}
+    if job_ids:
+        query["_id"] = {"$in": job_ids}
+    res = _jobs().update_many(query, {"$set": {"state": "queued", "attempts": 0, "available_at": _now()},
+                                      "$unset": {"finished_at": ""}})
+    return res.modified_count
+
+
+def dead_jobs(limit: int = 100) -> List[Dict[str, Any]]:
+    return list(_jobs().find({"state": "dead"}, {"filename": 1, "attempts": 1, "errors": 1, "finished_at": 1})
+                .sort("finished_at", -1).limit(limit))
+
+
+def _download(job: Dict[str, Any]) -> extractor.Source:
+    """The upload's bytes; large files are spooled to disk, as for direct uploads."""
+    if job["size"] > pipeline.SPOOL_THRESHOLD:
+        fd, path = tempfile.mkstemp(prefix="ingest-", dir=pipeline.SPOOL_DIR)
+        with os.fdopen(fd, "wb") as out:
+            _bucket().download_to_stream(job["file_id"], out)
+        return path
+    return _bucket().open_download_stream(job["file_id"]).read()
+
+
+@contextmanager
+def _stage(job: Dict[str, Any], timings: Dict[str, float], name: str) -> Iterator[None]:
+    """Publish the stage (and the timings so far), then time it."""
+    job["stage"] = name
+    _update(job, {"$set": {"stage": name, "timings": timings}})
+    started = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - started, 4)
+
+
+def process(job: Dict[str, Any], timings: Dict[str, float]) -> Dict[str, Any]:
+    """Run the upload pipeline for a claimed job; returns the upload result (as /upload-resume)."""
+    with _stage(job, timings, "download"):
+        source = _download(job)
+    try:
+        with _stage(job, timings, "dedup"):
+            digest, existing = pipeline.find_duplicate(source)
+        if existing:
+            dup = pipeline.DuplicateDocument(existing)
+            return {"employee_id": dup.employee_id, "embedding_id": dup.embedding_id, "duplicate": True}
+        with _stage(job, timings, "analyze"):
+            analysis = executors.cpu.submit(pipeline.analyze_document, source).result()
+    finally:
+        pipeline.release([source])
+    trace = analysis.pop("trace", None) or {}
+    if "ocr_images" in analysis:
+        with _stage(job, timings, "ocr"):
+            analysis = pipeline.complete_ocr(analysis)
+    _update(job, {"$set": {"analysis": {"timings": {k: round(v, 4) for k, v in trace.get("timings", {}).items()},
+                                        "counts": trace.get("counts", {})}}})
+    if not analysis["raw_text"]:
+        raise Rejected("Could not extract text")
+    analysis["content_hash"] = digest
+
+    with _stage(job, timings, "embed"):
+        vectors = executors.embed.submit(embedder.embed_texts, pipeline.embed_inputs(analysis)).result()
+    employee_id = str(uuid.uuid4())
+    with _stage(job, timings, "store"):
+        try:
+            embedding_id = pipeline.store_document(employee_id, analysis, vectors, job.get("filename"))
+        except pipeline.DuplicateDocument as dup:
+            return {"employee_id": dup.employee_id, "embedding_id": dup.embedding_id, "duplicate": True}
+    return {"employee_id": employee_id, "embedding_id": embedding_id, "duplicate": False}
+
+
+def run_job(job: Dict[str, Any]) -> str:
+    """Process a claimed job, renewing its lease meanwhile; returns the state it ended in.
+
+    Errors while recording the outcome (Mongo unreachable) are raised; the job
+    is then retried by whichever worker claims it after the lease expires.
+    AliasMoved (the vectors were re-embedded with another model) requeues the
+    job without using up an attempt and is raised.
+    """
+    timings: Dict[str, float] = {}
+    if job["attempts"] > MAX_ATTEMPTS:
+        # claimed again after its worker died every time, e.g. a file that crashes the process
+        fail(job, "lease expired on every attempt", timings, retry=False)
+        return "dead"
+    stop = threading.Event()
+
+    def renew():
+        while not stop.wait(LEASE_SECONDS / 3):
+            try:
+                heartbeat(job)
+            except LeaseLost:
+                return
+            except Exception:
+                pass  # transient Mongo error; the next beat retries
+
+    beat = threading.Thread(target=renew, name=f"lease-{job['_id'][:8]}", daemon=True)
+    beat.start()
+    try:
+        try:
+            result = process(job, timings)
+        except LeaseLost:
+            return "lost"
+        except db_qdrant.AliasMoved:
+            # not the document's fault: back to the queue for a worker on the new model
+            _update(job, {"$set": {"state": "queued", "available_at": _now()}, "$inc": {"attempts": -1},
+                          "$unset": {"lease_until": ""}})
+            raise
+        except Rejected as e:
+            fail(job, str(e), timings, retry=False)
+            return "dead"
+        except Exception as e:
+            fail(job, f"{type(e).__name__}: {e}", timings)
+            return "failed"
+        complete(job, result, timings)
+        return "done"
+    except LeaseLost:
+        return "lost"
+    finally:
+        stop.set()
@@ -0,0 +1,367 @@
+"""In-process BM25 index over resume text and extracted skills, for hybrid retrieval.
+
+Each resume is indexed on upload as the tokens of its cleaned text (minus
+stopwords) plus one ``~<skill>`` term per extracted skill, so exact keywords
+(certifications, rare tools) are found even when the vector search misses
+them. Postings are compact per-term arrays in memory and are persisted as an
+append-only log under LEXICAL_INDEX_DIR:
+
+  terms.txt - one term per line; a term's id is its line number
+  docs.log  - one binary record per document: employee_id, experience years,
+              length, then its term ids and term frequencies
+
+Writers append under a file lock. Every process replays what others have
+appended before it searches, so API workers and the batch pipeline share one
+index. Resumes stored by other hosts (queue workers, other API nodes) never
+reach this directory, so a background thread (start()) also indexes resumes
+stored in Mongo since the last check, every LEXICAL_CATCH_UP_SECONDS; searches
+only read the index. The newest resume ``_id`` seen is kept in ``mongo.pos``. Resumes stored before
+the index existed are added by python -m backend.scripts.build_lexical_index.
+"""
+import math
+import os
+import struct
+import threading
+from array import array
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from . import db_mongo, skill_extractor
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+ENABLED = os.getenv("LEXICAL_SEARCH", "1") not in ("0", "false", "no")
+INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR") or os.path.join(os.path.dirname(__file__), "..", "data", "lexical_index")
+K1 = float(os.getenv("BM25_K1", "1.2"))
+B = float(os.getenv("BM25_B", "0.75"))
+# Query weight of a JD skill relative to a plain JD word.
+SKILL_BOOST = float(os.getenv("LEXICAL_SKILL_BOOST", "2.0"))
+# Reciprocal rank fusion constant: a hit at rank r in either list contributes 1 / (RRF_K + r).
+RRF_K = int(os.getenv("LEXICAL_RRF_K", "60"))
+# Seconds between background checks of Mongo for resumes stored elsewhere (0 or less: never, e.g. when
+# LEXICAL_INDEX_DIR is on storage shared by every host that stores resumes).
+CATCH_UP_SECONDS = float(os.getenv("LEXICAL_CATCH_UP_SECONDS", "1"))
+# Resumes are re-checked this far behind the newest one seen: ObjectIds come from each
+# client's clock, and an insert in flight can commit after a later one.
+CATCH_UP_LOOKBACK = timedelta(minutes=5)
+CATCH_UP_BATCH = 1000
+STORED_PROJECTION = {"_id": 0, "employee_id": 1, "cleaned_text": 1, "skills": 1, "experience_years": 1}
+SKILL_PREFIX = "~"
+STOPWORDS_PATH = os.path.join(os.path.dirname(__file__), "..", "models", "stopwords.txt")
+
+# kind ("A"dd), employee_id length, experience years, document length, number of terms
+_HEADER = struct.Struct("<cHfII")
+_READ_CHUNK = 8 * 1024 * 1024
+
+_INDEX: Optional["LexicalIndex"] = None
+_INDEX_LOCK = threading.Lock()
+_CATCH_UP_LOCK = threading.Lock()
+_follower: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _load_stopwords() -> frozenset:
+    try:
+        with open(STOPWORDS_PATH, "r", encoding="utf-8") as f:
+            return frozenset(w.strip().lower() for w in f if w.strip())
+    except OSError:
+        return frozenset()
+
+
+STOPWORDS = _load_stopwords()
+
+
+def text_terms(text: str) -> List[str]:
+    return [t for t in skill_extractor.tokenize(text) if t not in STOPWORDS]
+
+
+def skill_terms(skills: Iterable[str]) -> List[str]:
+    return [SKILL_PREFIX + s.lower() for s in skills]
+
+
+class LexicalIndex:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.terms_path = os.path.join(directory, "terms.txt")
+        self.log_path = os.path.join(directory, "docs.log")
+        self.lock_path = os.path.join(directory, "lock")
+        self._term_ids: Dict[str, int] = {}
+        self._doc_postings: List[array] = []  # per term: document numbers
+        self._tf_postings: List[array] = []  # per term: frequencies, parallel to _doc_postings
+        self._ids: List[str] = []
+        self._doc_no: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._years = array("f")
+        self._total_length = 0
+        self._terms_offset = 0
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, employee_id: str) -> bool:
+        return employee_id in self._doc_no
+
+    def refresh(self):
+        """Apply terms and records appended (by any process) since the last refresh."""
+        with self._lock:
+            self._read_terms()
+            self._read_log()
+
+    def _read_terms(self):
+        if not os.path.exists(self.terms_path):
+            return
+        with open(self.terms_path, "rb") as f:
+            f.seek(self._terms_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a torn last line is left for the writer to repair
+        for term in data[:end].decode("utf-8").split("\n")[:-1]:
+            self._term_ids[term] = len(self._doc_postings)
+            self._doc_postings.append(array("I"))
+            self._tf_postings.append(array("H"))
+        self._terms_offset += end
+
+    def _read_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            pending = b""
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                pending += chunk
+                used = self._apply_records(pending)
+                self._log_offset += used
+                pending = pending[used:]
+
+    def _apply_records(self, buf: bytes) -> int:
+        """Apply the complete records at the start of buf; returns the bytes consumed."""
+        pos = 0
+        while pos + _HEADER.size <= len(buf):
+            kind, id_len, years, length, n = _HEADER.unpack_from(buf, pos)
+            end = pos + _HEADER.size + id_len + 6 * n
+            if end > len(buf):
+                break
+            body = pos + _HEADER.size
+            employee_id = buf[body:body + id_len].decode("utf-8")
+            term_ids = np.frombuffer(buf, dtype="<u4", count=n, offset=body + id_len)
+            tfs = np.frombuffer(buf, dtype="<u2", count=n, offset=body + id_len + 4 * n)
+            if kind == b"A" and employee_id not in self._doc_no:
+                doc = len(self._ids)
+                self._ids.append(employee_id)
+                self._doc_no[employee_id] = doc
+                self._lengths.append(length)
+                self._years.append(years)
+                self._total_length += length
+                for term_id, tf in zip(term_ids.tolist(), tfs.tolist()):
+                    self._doc_postings[term_id].append(doc)
+                    self._tf_postings[term_id].append(tf)
+            pos = end
+        return pos
+
+    def add_many(self, items: List[Tuple[str, str, List[str], float]]):
+        """Index (employee_id, cleaned_text, skills, experience_years) tuples; known ids are skipped."""
+        with self._lock, open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                self._repair_tails()
+                new_terms: List[str] = []
+                records = []
+                for employee_id, text, skills, years in items:
+                    if employee_id in self._doc_no:
+                        continue
+                    tokens = text_terms(text)
+                    counts = Counter(tokens)
+                    counts.update(set(skill_terms(skills)))
+                    ids, tfs = [], []
+                    for term, tf in counts.items():
+                        term_id = self._term_ids.get(term)
+                        if term_id is None:
+                            term_id = self._term_ids[term] = len(self._doc_postings) + len(new_terms)
+                            new_terms.append(term)
+                        ids.append(term_id)
+                        tfs.append(min(tf, 0xFFFF))
+                    raw_id = employee_id.encode("utf-8")
+                    records.append(_HEADER.pack(b"A", len(raw_id), float(years or 0.0), len(tokens), len(ids)) + raw_id
+                                   + np.asarray(ids, dtype="<u4").tobytes() + np.asarray(tfs, dtype="<u2").tobytes())
+                # the in-memory ids of new terms are re-assigned by refresh() from the file
+                for term in new_terms:
+                    del self._term_ids[term]
+                if new_terms:
+                    with open(self.terms_path, "ab") as f:
+                        f.write("".join(t + "\n" for t in new_terms).encode("utf-8"))
+                if records:
+                    with open(self.log_path, "ab") as f:
+                        f.write(b"".join(records))
+                self.refresh()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _repair_tails(self):
+        """Drop bytes a crashed writer left after the last complete line/record (lock held, just refreshed)."""
+        for path, offset in ((self.terms_path, self._terms_offset), (self.log_path, self._log_offset)):
+            if os.path.exists(path) and os.path.getsize(path) > offset:
+                os.truncate(path, offset)
+
+    def search(self, text: str, skills: List[str], top_k: int, must_skills: Optional[List[str]] = None,
+               min_years: Optional[float] = None) -> List[Tuple[str, float]]:
+        """(employee_id, BM25 score) of the best matches for a JD's text and skills, best first."""
+        weights: Dict[str, float] = {t: 1.0 for t in text_terms(text)}
+        for term in skill_terms(skills):
+            weights[term] = SKILL_BOOST
+        with self._lock:
+            self.refresh()
+            return self._search(weights, top_k, skill_terms(must_skills or []), min_years)
+
+    def _search(self, weights: Dict[str, float], top_k: int, required: List[str],
+                min_years: Optional[float]) -> List[Tuple[str, float]]:
+        n_docs = len(self._ids)
+        if not n_docs or top_k <= 0:
+            return []
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+        norm = K1 * (1 - B + B * lengths / max(self._total_length / n_docs, 1e-9))
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term, weight in weights.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            docs = np.frombuffer(self._doc_postings[term_id], dtype=np.uint32)
+            tf = np.frombuffer(self._tf_postings[term_id], dtype=np.uint16).astype(np.float32)
+            idf = math.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += weight * idf * tf * (K1 + 1) / (tf + norm[docs])
+        keep = scores > 0
+        for term in required:
+            term_id = self._term_ids.get(term)
+            has = np.zeros(n_docs, dtype=bool)
+            if term_id is not None:
+                has[np.frombuffer(self._doc_postings[term_id], dtype=np.uint32)] = True
+            keep &= has
+        if min_years:
+            keep &= np.frombuffer(self._years, dtype=np.float32) >= min_years
+        candidates = np.flatnonzero(keep)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._ids[i], float(scores[i])) for i in candidates.tolist()]
+
+
+def fuse(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Reciprocal rank fusion of ranked id lists; ids missing from a list get nothing from it."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+def get_index() -> LexicalIndex:
+    global _INDEX
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = LexicalIndex(INDEX_DIR)
+    return _INDEX
+
+
+def add_documents(items: List[Tuple[str, str, List[str], float]]):
+    if ENABLED and items:
+        get_index().add_many(items)
+
+
+def add_stored(index: LexicalIndex, profiles: Iterable[Dict]):
+    """Index stored profiles (with STORED_PROJECTION fields)."""
+    index.add_many([(p["employee_id"], p.get("cleaned_text") or "", p.get("skills") or [], p.get("experience_years", 0.0))
+                    for p in profiles])
+
+
+def catch_up(full: bool = False) -> int:
+    """Index resumes stored since the last catch-up (by any host); returns how many were added.
+
+    Only ids are read for resumes already in the index. ``full`` checks every
+    stored resume, as does the first catch-up of a new index.
+    """
+    with _CATCH_UP_LOCK:
+        return _catch_up(full)
+
+
+def _catch_up(full: bool) -> int:
+    index = get_index()
+    before = len(index)
+    since = None if full else _read_position(index)
+    query: Dict = {"cleaned_text": {"$exists": True}}
+    if since is not None:
+        query["_id"] = {"$gt": ObjectId.from_datetime(since.generation_time - CATCH_UP_LOOKBACK)}
+    newest, missing = since, []
+    for doc in db_mongo.iter_resumes(query, {"_id": 1, "employee_id": 1}, batch_size=CATCH_UP_BATCH):
+        newest = doc["_id"] if newest is None else max(newest, doc["_id"])
+        if doc["employee_id"] not in index:
+            missing.append(doc["employee_id"])
+        if len(missing) >= CATCH_UP_BATCH:
+            add_stored(index, db_mongo.get_resumes_by_employees(missing, STORED_PROJECTION).values())
+            missing = []
+    if missing:
+        add_stored(index, db_mongo.get_resumes_by_employees(missing, STORED_PROJECTION).values())
+    if newest is not None and newest != since:
+        _write_position(index, newest)
+    return len(index) - before
+
+
+def _position_path(index: LexicalIndex) -> str:
+    return os.path.join(index.directory, "mongo.pos")
+
+
+def _read_position(index: LexicalIndex) -> Optional[ObjectId]:
+    try:
+        with open(_position_path(index), "r", encoding="ascii") as f:
+            return ObjectId(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_position(index: LexicalIndex, oid: ObjectId):
+    # processes may race here; an older position only means a longer next check
+    tmp = f"{_position_path(index)}.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding="ascii") as f:
+        f.write(str(oid))
+    os.replace(tmp, _position_path(index))
+
+
+def start():
+    """Catch up once, then keep catching up every CATCH_UP_SECONDS in a background thread."""
+    global _follower
+    catch_up()
+    if CATCH_UP_SECONDS > 0 and _follower is None:
+        _follower = threading.Thread(target=_follow, name="lexical-catch-up", daemon=True)
+        _follower.start()
+
+
+def _follow():
+    while not _stop.wait(CATCH_UP_SECONDS):
+        try:
+            catch_up()
+        except Exception:
+            pass  # Mongo unreachable: searches use what is indexed, the next round retries
+
+
+def stop():
+    _stop.set()
+
+
+def search(text: str, skills: List[str], top_k: int, must_skills: Optional[List[str]] = None,
+           min_years: Optional[float] = None) -> List[Tuple[str, float]]:
+    return get_index().search(text, skills, top_k, must_skills, min_years)
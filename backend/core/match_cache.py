@@ -0,0 +1,144 @@
+"""Stored match rankings per (jd_id, weights, filters, candidate pool).
+
+``/match/run`` requests that name a stored JD keep their top MATCH_CACHE_DEPTH
+candidates in the Mongo ``match_results`` collection and later requests are
+served from it. New resumes are scored against every cached JD after they
+are stored (in the background, see pipeline._update_match_cache) and spliced
+into the rankings, so a full re-run is only needed when the embedding model
+changes (entries are tagged with its identity and ignored otherwise). Entries
+expire MATCH_CACHE_TTL_SECONDS after they were computed, which bounds how many
+rankings each upload has to update.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import db_mongo, embedder, metrics, scoring
+
+ENABLED = os.getenv("MATCH_CACHE", "1") not in ("0", "false", "no")
+DEPTH = int(os.getenv("MATCH_CACHE_DEPTH", "100"))
+TTL_SECONDS = int(os.getenv("MATCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+MAX_RETRIES = 5
+
+HITS = metrics.counter("match_cache_hits", "Match requests served from stored rankings")
+MISSES = metrics.counter("match_cache_misses", "Match requests that ran the full search")
+SPLICES = metrics.counter("match_cache_splices", "Stored rankings updated with newly ingested resumes")
+
+
+def _collection():
+    return db_mongo.get_db().match_results
+
+
+def _model_id() -> str:
+    return embedder.get_cache().model_id
+
+
+def make_key(jd_id: str, weights: Tuple[float, float, float], must_skills: Iterable[str],
+             min_years: Optional[float], pool_size: int) -> str:
+    spec = {
+        "jd_id": jd_id,
+        "weights": [round(w, 6) for w in weights],
+        "must_skills": sorted(set(s.lower() for s in must_skills)),
+        "min_years": min_years,
+        "pool": pool_size,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get(key: str, top_k: int) -> Optional[List[Dict[str, Any]]]:
+    """Cached top_k rows, or None if absent, stale or too shallow for top_k."""
+    doc = _collection().find_one({"key": key, "model_id": _model_id()}, {"_id": 0, "results": 1, "complete": 1})
+    if doc is None or (len(doc["results"]) < top_k and not doc["complete"]):
+        MISSES.inc()
+        return None
+    HITS.inc()
+    return doc["results"][:top_k]
+
+
+def put(key: str, jd_id: str, weights: Tuple[float, float, float], must_skills: Iterable[str],
+        min_years: Optional[float], pool_size: int, rows: List[Dict[str, Any]], depth: int):
+    _collection().replace_one({"key": key}, {
+        "key": key,
+        "jd_id": jd_id,
+        "model_id": _model_id(),
+        "weights": list(weights),
+        "must_skills": sorted(set(s.lower() for s in must_skills)),
+        "min_years": min_years,
+        "pool": pool_size,
+        "depth": depth,
+        # fewer rows than asked for means every candidate that passed the filters is listed
+        "complete": len(rows) < depth,
+        "results": rows,
+        "version": 0,
+        "expire_at": datetime.now(timezone.utc) + timedelta(seconds=TTL_SECONDS),
+    }, upsert=True)
+
+
+def invalidate(jd_id: Optional[str] = None):
+    _collection().delete_many({} if jd_id is None else {"jd_id": jd_id})
+
+
+def _eligible(entry: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+    skills = set(s.lower() for s in payload.get("skills", []))
+    if not set(entry["must_skills"]) <= skills:
+        return False
+    return entry["min_years"] is None or payload.get("experience_years", 0.0) >= entry["min_years"]
+
+
+def _splice(entry: Dict[str, Any], jd: Dict[str, Any],
+            items: Sequence[Tuple[str, List[List[float]], Dict[str, Any]]]) -> bool:
+    """Merge the eligible new candidates into one entry; False if a concurrent write won."""
+    new = [it for it in items if _eligible(entry, it[2])]
+    if not new:
+        return True
+    jd_vec = np.asarray(jd["embedding"], dtype=np.float64)
+    # max-sim over the whole-document and chunk vectors, as in the search
+    sims = [float(np.max(np.asarray(vecs, dtype=np.float64) @ jd_vec)) for _, vecs, _ in new]
+    skill_w, exp_w, embed_w = entry["weights"]
+    rows = scoring.rank([eid for eid, _, _ in new], [p for _, _, p in new], sims, jd.get("skills", []),
+                        float(jd.get("min_experience", 0.0)), skill_w, exp_w, embed_w, len(new))
+    ids = {r["employee_id"] for r in rows}
+    merged = sorted([r for r in entry["results"] if r["employee_id"] not in ids] + rows,
+                    key=lambda r: -r["final_score"])
+    depth = entry["depth"]
+    complete = entry["complete"] and len(merged) <= depth
+    if merged[:depth] == entry["results"] and complete == entry["complete"]:
+        return True
+    res = _collection().update_one(
+        {"key": entry["key"], "version": entry["version"]},
+        {"$set": {"results": merged[:depth], "complete": complete}, "$inc": {"version": 1}},
+    )
+    if res.modified_count:
+        SPLICES.inc()
+    return bool(res.modified_count)
+
+
+def on_resumes_added(items: Sequence[Tuple[str, List[List[float]], Dict[str, Any]]]):
+    """Splice newly stored resumes, given as (employee_id, vectors, scoring payload), into cached rankings.
+
+    ``vectors`` holds the whole-document vector followed by any chunk vectors.
+    Entries and their JDs are read in one query each; only entries whose
+    update lost a race are read again.
+    """
+    if not ENABLED or not items:
+        return
+    coll = _collection()
+    entries = list(coll.find({"model_id": _model_id()}, {"_id": 0}))
+    jds = db_mongo.get_jds(sorted({e["jd_id"] for e in entries}))
+    for entry in entries:
+        jd = jds.get(entry["jd_id"])
+        if jd is None:
+            coll.delete_one({"key": entry["key"]})
+            continue
+        for _ in range(MAX_RETRIES):
+            if _splice(entry, jd, items):
+                break
+            entry = coll.find_one({"key": entry["key"]}, {"_id": 0})
+            if entry is None:
+                break
+        else:
+            coll.delete_one({"key": entry["key"]})  # persistent contention: fall back to a full re-run
@@ -0,0 +1,178 @@
+"""Minimal in-process metrics: counters, gauges and fixed-bucket histograms.
+
+Metrics may carry a fixed label set (e.g. ``stage="ocr"``); ``render()`` emits
+everything in the Prometheus text exposition format.
+"""
+import bisect
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _label_str(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _num(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str = "", labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "counter", "value": self._value}
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [(self.name, _label_str(self.labels), self._value)]
+
+
+class Gauge:
+    """Settable value, or a callback evaluated at read time."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str = "", labels: Labels = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._fn = fn
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return float(self._fn()) if self._fn is not None else self._value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"type": "gauge", "value": self.value}
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [(self.name, _label_str(self.labels), self.value)]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, buckets: Sequence[float], help: str = "", labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for le, c in zip([*map(str, self.buckets), "+Inf"], counts):
+            running += c
+            cumulative[le] = running
+        return {"type": "histogram", "buckets": cumulative, "count": count, "sum": round(total, 6)}
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        out, running = [], 0
+        for le, c in zip([*self.buckets, math.inf], counts):
+            running += c
+            out.append((f"{self.name}_bucket", _label_str(self.labels, ("le", _num(le))), running))
+        out.append((f"{self.name}_sum", _label_str(self.labels), total))
+        out.append((f"{self.name}_count", _label_str(self.labels), count))
+        return out
+
+
+_REGISTRY: Dict[Tuple[str, Labels], Any] = {}
+_LOCK = threading.Lock()
+
+
+def _key(name: str, labels: Optional[Dict[str, str]]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def _get_or_create(name: str, labels: Optional[Dict[str, str]], make: Callable[[Labels], Any]):
+    key = _key(name, labels)
+    with _LOCK:
+        if key not in _REGISTRY:
+            _REGISTRY[key] = make(key[1])
+        return _REGISTRY[key]
+
+
+def counter(name: str, help: str = "", labels: Optional[Dict[str, str]] = None) -> Counter:
+    return _get_or_create(name, labels, lambda l: Counter(name, help, l))
+
+
+def gauge(name: str, help: str = "", labels: Optional[Dict[str, str]] = None,
+          fn: Optional[Callable[[], float]] = None) -> Gauge:
+    return _get_or_create(name, labels, lambda l: Gauge(name, help, l, fn))
+
+
+def histogram(name: str, buckets: Sequence[float], help: str = "", labels: Optional[Dict[str, str]] = None) -> Histogram:
+    return _get_or_create(name, labels, lambda l: Histogram(name, buckets, help, l))
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    with _LOCK:
+        items = list(_REGISTRY.items())
+    return {name + _label_str(labels): m.snapshot() for (name, labels), m in items}
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _LOCK:
+        items = sorted(_REGISTRY.items(), key=lambda kv: kv[0])
+    lines: List[str] = []
+    described = set()
+    for (name, _), m in items:
+        if name not in described:
+            described.add(name)
+            if m.help:
+                lines.append(f"# HELP {name} {m.help}")
+            lines.append(f"# TYPE {name} {m.type}")
+        for sample, labels, value in m.samples():
+            lines.append(f"{sample}{labels} {_num(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,153 @@
+"""ONNX Runtime backend for the sentence embedding model (EMBED_BACKEND=onnx|onnx-int8).
+
+The transformer from ``local_models/embeddings`` is exported once to
+``onnx/model.onnx`` (and optionally dynamically quantized to
+``onnx/model_int8.onnx``) by ``scripts/download_models.py --onnx [--int8]``. At
+runtime only ``onnxruntime`` and ``tokenizers`` are needed: inputs are tokenized
+with the model's ``tokenizer.json`` and pooled as described by its
+``1_Pooling/config.json``, so vectors match the SentenceTransformer ones.
+
+Export and the accuracy check need torch/transformers/sentence-transformers;
+serving does not.
+"""
+import inspect
+import json
+import os
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+
+ONNX_SUBDIR = "onnx"
+# intra-op threads per session; defaults to the core count of the node
+THREADS = int(os.getenv("EMBED_THREADS", str(os.cpu_count() or 1)))
+BATCH_SIZE = 32
+MIN_COSINE = float(os.getenv("EMBED_ONNX_MIN_COSINE", "0.99"))
+
+SAMPLE_TEXTS = [
+    "Senior backend engineer with 7 years of Python, Django and PostgreSQL experience.",
+    "Built CI/CD pipelines on AWS using Docker, Kubernetes and Terraform.",
+    "Frontend developer skilled in React, TypeScript and accessibility.",
+    "Data scientist: machine learning, pandas, scikit-learn, Spark; MSc in statistics.",
+    "We are hiring a DevOps engineer, minimum 3 years, familiar with Linux and monitoring.",
+    "Project manager certified in PMP and Scrum, led teams of 12 across three time zones.",
+    "Education: B.Tech in Computer Science, 2016. Certifications: AWS Solutions Architect.",
+    "Summary",
+]
+
+
+def artifact_path(model_dir: str, quantized: bool = False) -> str:
+    return os.path.join(model_dir, ONNX_SUBDIR, "model_int8.onnx" if quantized else "model.onnx")
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_tokenizer(model_dir: str, max_length: int):
+    from tokenizers import Tokenizer
+
+    tok = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+    pad_token = _read_json(os.path.join(model_dir, "tokenizer_config.json")).get("pad_token") or "[PAD]"
+    if isinstance(pad_token, dict):
+        pad_token = pad_token.get("content", "[PAD]")
+    tok.enable_truncation(max_length=max_length)
+    tok.enable_padding(pad_id=tok.token_to_id(pad_token) or 0, pad_token=pad_token)
+    return tok
+
+
+class OnnxEncoder:
+    """Drop-in for the parts of SentenceTransformer the embedder uses."""
+
+    def __init__(self, model_dir: str, onnx_path: str, threads: int = THREADS):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"{onnx_path} missing; run scripts/download_models.py --onnx")
+        st_config = _read_json(os.path.join(model_dir, "sentence_bert_config.json"))
+        pooling = _read_json(os.path.join(model_dir, "1_Pooling", "config.json"))
+        self.max_length = int(st_config.get("max_seq_length", 256))
+        self.cls_pooling = bool(pooling.get("pooling_mode_cls_token"))
+        self.dimension = pooling.get("word_embedding_dimension")
+        self.tokenizer = load_tokenizer(model_dir, self.max_length)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        encs = self.tokenizer.encode_batch(list(texts))
+        ids = np.array([e.ids for e in encs], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encs], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encs], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+        if self.cls_pooling:
+            return hidden[:, 0]
+        m = mask[..., None].astype(hidden.dtype)
+        return (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: Union[str, Sequence[str]], show_progress_bar: bool = False,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        # length-sorted batches keep padding (and wasted FLOPs) low
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(order), BATCH_SIZE):
+            idx = order[start:start + BATCH_SIZE]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self.dimension is None:
+            self.dimension = int(self._encode_batch(["x"]).shape[1])
+        return self.dimension
+
+
+def export(model_dir: str, quantize: bool = False, opset: int = 14) -> str:
+    """Export the transformer to ONNX (and an int8 copy if quantize); returns the artifact to serve."""
+    import torch
+    from transformers import AutoModel
+
+    out = artifact_path(model_dir)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    model = AutoModel.from_pretrained(model_dir)
+    model.eval()
+    tok = load_tokenizer(model_dir, 128)
+    encs = tok.encode_batch(SAMPLE_TEXTS[:2])
+    args = [torch.tensor([e.ids for e in encs]), torch.tensor([e.attention_mask for e in encs])]
+    names = ["input_ids", "attention_mask"]
+    if "token_type_ids" in inspect.signature(model.forward).parameters:
+        args.append(torch.tensor([e.type_ids for e in encs]))
+        names.append("token_type_ids")
+    axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(args), out, input_names=names, output_names=["last_hidden_state"],
+                          dynamic_axes=axes, opset_version=opset, do_constant_folding=True)
+    if not quantize:
+        return out
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    q_out = artifact_path(model_dir, quantized=True)
+    quantize_dynamic(out, q_out, weight_type=QuantType.QInt8)
+    return q_out
+
+
+def check_accuracy(model_dir: str, onnx_path: str, texts: Sequence[str] = SAMPLE_TEXTS) -> Dict[str, float]:
+    """Cosine similarity between PyTorch and ONNX vectors over a sample set."""
+    from sentence_transformers import SentenceTransformer
+
+    ref = SentenceTransformer(model_dir).encode(list(texts), normalize_embeddings=True)
+    got = OnnxEncoder(model_dir, onnx_path).encode(list(texts), normalize_embeddings=True)
+    cos: List[float] = np.sum(ref * got, axis=1).tolist()
+    return {"min_cosine": float(min(cos)), "mean_cosine": float(np.mean(cos)), "samples": len(cos)}
@@ -0,0 +1,410 @@
+"""Resume ingestion pipeline shared by the upload endpoints.
+
+CPU-bound stages (extraction, OCR, cleaning, classification, skill and
+experience extraction) run on the ``cpu`` executor; embeddings are computed in
+mini-batches on the ``embed`` executor as analysed documents come back, and
+each mini-batch is written to Qdrant/Mongo with bulk operations.
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import extractor, classifier, skill_extractor, experience_extractor, embedder, db_mongo, db_qdrant, executors, lexical_index, match_cache, tracing
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+ARCHIVE_EXTENSIONS = (".zip",)
+# Uploads (and archive members) larger than this are spooled to disk and memory-mapped
+# by the extractor instead of being held in RAM and pickled to pool workers.
+SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Section chunk size in words; keeps chunks inside the embedding model's max sequence length.
+CHUNK_WORDS = int(os.getenv("EMBED_CHUNK_WORDS", "180"))
+CHUNK_OVERLAP = int(os.getenv("EMBED_CHUNK_OVERLAP", "30"))
+
+
+class DuplicateDocument(Exception):
+    """The document's content hash is already stored under another profile."""
+
+    def __init__(self, existing: Dict[str, Any]):
+        super().__init__(f"duplicate of {existing['employee_id']}")
+        self.employee_id = existing["employee_id"]
+        self.embedding_id = str(existing.get("embedding_id"))
+
+
+def spool(fileobj) -> str:
+    """Stream a file object to a temp file in fixed-size chunks; returns its path."""
+    fd, path = tempfile.mkstemp(prefix="upload-", dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    except BaseException:
+        release([path])
+        raise
+    return path
+
+
+def release(sources: List[extractor.Source]):
+    """Delete spool files among sources; in-memory sources are ignored."""
+    for source in sources:
+        if isinstance(source, str):
+            try:
+                os.unlink(source)
+            except FileNotFoundError:
+                pass
+
+
+def content_hash(source: extractor.Source) -> str:
+    """sha256 of the raw upload bytes; spooled files are streamed."""
+    h = hashlib.sha256()
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    else:
+        h.update(source)
+    return h.hexdigest()
+
+
+def find_duplicate(source: extractor.Source) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """(content hash, stored profile with that hash or None)."""
+    digest = content_hash(source)
+    return digest, db_mongo.get_resumes_by_hashes([digest]).get(digest)
+
+
+def analyze_document(source: extractor.Source) -> Dict[str, Any]:
+    """Run the CPU-bound stages for one document. Safe to call in a pool worker.
+
+    Stage timings and extraction events are returned under "trace" for
+    tracing.merge() in the calling process. Pages that need OCR are only
+    rendered here: the result then holds "ocr_images" instead of the analysis,
+    and the caller finishes it with complete_ocr().
+    """
+    with tracing.collect() as trace, extractor.deferred_ocr() as ocr_images:
+        if isinstance(source, str):
+            text, mime = extractor.extract_file(source)
+        else:
+            text, mime = extractor.extract(source)
+        if ocr_images:
+            analysis = {"raw_text": text, "mime": mime, "ocr_images": ocr_images}
+        else:
+            analysis = _analyze_text(text, mime)
+    analysis["trace"] = trace
+    return analysis
+
+
+def analyze_text(text: str, mime: str) -> Dict[str, Any]:
+    """The stages after extraction, for a document whose OCR ran in the parent; "trace" as analyze_document."""
+    with tracing.collect() as trace:
+        analysis = _analyze_text(text, mime)
+    analysis["trace"] = trace
+    return analysis
+
+
+def complete_ocr(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Finish a document analyze_document returned with "ocr_images"; blocks, so run it on executors.ocr.
+
+    The pages are recognized in parallel on the single OCR pool of this
+    process, then the text is analysed on the cpu pool, or in this thread
+    while the cpu pool is full: waiting for a slot there could wait on the
+    very batch this document belongs to.
+    """
+    with tracing.stage("ocr"):
+        texts = extractor.recognize(analysis["ocr_images"])
+    text = extractor.fill_ocr(analysis["raw_text"], texts).strip()
+    try:
+        fut = executors.cpu.submit(analyze_text, text, analysis["mime"], block=False)
+    except executors.Overloaded:
+        return _analyze_text(text, analysis["mime"])
+    result = fut.result()
+    tracing.merge(result.pop("trace", None))
+    return result
+
+
+def _analyze_text(text: str, mime: str) -> Dict[str, Any]:
+    if not text:
+        tracing.count("extraction_failures")
+        return {"raw_text": "", "mime": mime}
+    with tracing.stage("segment"):
+        cleaned, spans = classifier.clean_and_segment(text)
+        sections = classifier.section_texts(cleaned, spans)
+    with tracing.stage("chunk"):
+        chunks = classifier.chunk_sections(sections, cleaned, CHUNK_WORDS, CHUNK_OVERLAP)
+    with tracing.stage("skills"):
+        skills = skill_extractor.extract_skills(cleaned)
+    with tracing.stage("experience"):
+        years = experience_extractor.compute_years(cleaned)
+    return {
+        "raw_text": text,
+        "cleaned_text": cleaned,
+        "sections": sections,
+        "chunks": chunks,
+        "skills": skills,
+        "experience_years": years,
+        "mime": mime,
+    }
+
+
+def build_profile(employee_id: str, analysis: Dict[str, Any], embedding_id: str, filename: Optional[str]) -> Dict[str, Any]:
+    profile = {
+        "employee_id": employee_id,
+        "raw_text": analysis["raw_text"],
+        "cleaned_text": analysis["cleaned_text"],
+        "sections": analysis["sections"],
+        "skills": analysis["skills"],
+        "experience_years": analysis["experience_years"],
+        "embedding_id": embedding_id,
+        "mime": analysis["mime"],
+        "filename": filename,
+    }
+    if analysis.get("content_hash"):
+        profile["content_hash"] = analysis["content_hash"]
+    return profile
+
+
+def scoring_payload(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields stored alongside the vector so matching needs no Mongo lookup."""
+    return {
+        "skills": [s.lower() for s in analysis["skills"]],
+        "experience_years": analysis["experience_years"],
+        "summary": analysis["sections"].get("summary", "")[:500],
+    }
+
+
+def jd_payload(jd: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields stored with a JD vector for reverse (jobs-for-candidate) matching."""
+    return {
+        "skills": [s.lower() for s in jd.get("skills", [])],
+        "min_experience": float(jd.get("min_experience", 0.0)),
+        "seniority": jd.get("seniority", ""),
+    }
+
+
+def store_jd(jd: Dict[str, Any]):
+    """Write a processed JD to Mongo and its vector to the JD collection."""
+    db_qdrant.ensure_jd_collection(len(jd["embedding"]))
+    # before the Mongo write: the stored embedding must come from the model the alias serves
+    db_qdrant.check_writable(db_qdrant.JD_COLLECTION_NAME)
+    with tracing.stage("mongo"):
+        db_mongo.insert_jd(jd)
+    with tracing.stage("qdrant"):
+        db_qdrant.upsert_jds([(jd["jd_id"], jd["embedding"])], [jd_payload(jd)])
+
+
+def embed_inputs(analysis: Dict[str, Any]) -> List[str]:
+    """Texts to encode for one document: the whole cleaned text, then its section chunks."""
+    chunks = analysis.get("chunks", []) if db_qdrant.CHUNKS_ENABLED else []
+    return [analysis["cleaned_text"]] + [c["text"] for c in chunks]
+
+
+def store_document(employee_id: str, analysis: Dict[str, Any], vectors: List[List[float]], filename: Optional[str]) -> str:
+    """Write one analysed document to Qdrant and Mongo; returns the embedding id.
+
+    ``vectors`` are the encodings of embed_inputs(analysis), in order. Raises
+    DuplicateDocument if a concurrent upload stored the same content first.
+    """
+    payload = scoring_payload(analysis)
+    with tracing.stage("qdrant"):
+        db_qdrant.ensure_collection(len(vectors[0]))
+        embedding_id = db_qdrant.upsert_embedding(employee_id, vectors[0], payload)
+        if len(vectors) > 1:
+            db_qdrant.ensure_chunk_collection(len(vectors[0]))
+            db_qdrant.upsert_chunks([(employee_id, analysis["chunks"], vectors[1:], payload)])
+    with tracing.stage("mongo"):
+        rejected = db_mongo.insert_resumes([build_profile(employee_id, analysis, embedding_id, filename)])
+    if rejected:
+        db_qdrant.delete_resumes([employee_id])
+        raise DuplicateDocument(db_mongo.get_resumes_by_hashes([analysis["content_hash"]])[analysis["content_hash"]])
+    _update_lexical_index([(employee_id, analysis)])
+    _update_match_cache([(employee_id, vectors, payload)])
+    return embedding_id
+
+
+def _update_lexical_index(items: List[Tuple[str, Dict[str, Any]]]):
+    try:
+        with tracing.stage("lexical"):
+            lexical_index.add_documents([(e, a["cleaned_text"], a["skills"], a["experience_years"]) for e, a in items])
+    except Exception:
+        # the resume is stored; build_lexical_index picks it up on its next run
+        pass
+
+
+def _update_match_cache(items: List[Tuple[str, List[List[float]], Dict[str, Any]]]):
+    """Splice the stored resumes into cached rankings on the io pool, off the upload's path."""
+    if not match_cache.ENABLED or not items:
+        return
+    try:
+        fut = executors.io.submit(match_cache.on_resumes_added, items, block=False)
+    except executors.Overloaded:
+        _drop_match_cache()
+        return
+    fut.add_done_callback(lambda f: (f.cancelled() or f.exception() is not None) and _drop_match_cache())
+
+
+def _drop_match_cache():
+    # a ranking that missed these resumes must not be served again
+    try:
+        match_cache.invalidate()
+    except Exception:
+        pass
+
+
+def expand_uploads(uploads: List[Tuple[str, extractor.Source]]) -> List[Tuple[str, extractor.Source]]:
+    """Flatten ZIP archives into their member files; other uploads pass through.
+
+    Large members are spooled to disk; callers release() both lists when done.
+    If expansion fails, the members spooled so far are released here.
+    """
+    docs: List[Tuple[str, extractor.Source]] = []
+    spooled: List[str] = []
+    try:
+        for filename, source in uploads:
+            if not (filename or "").lower().endswith(ARCHIVE_EXTENSIONS):
+                docs.append((filename, source))
+                continue
+            try:
+                with zipfile.ZipFile(source if isinstance(source, str) else io.BytesIO(source)) as zf:
+                    for info in zf.infolist():
+                        name = info.filename
+                        base = os.path.basename(name)
+                        if info.is_dir() or name.startswith("__MACOSX/") or not base or base.startswith("."):
+                            continue
+                        if info.file_size > SPOOL_THRESHOLD:
+                            with zf.open(info) as member:
+                                spooled.append(spool(member))
+                            docs.append((f"{filename}/{name}", spooled[-1]))
+                        else:
+                            docs.append((f"{filename}/{name}", zf.read(info)))
+            except zipfile.BadZipFile:
+                docs.append((filename, source))
+    except BaseException:
+        release(spooled)
+        raise
+    return docs
+
+
+def _store(ready: List[Tuple[int, Dict[str, Any]]], results: Dict[int, Dict[str, Any]], names: List[str]):
+    """Embed one mini-batch of analysed documents (chunks included) in one call and bulk-write them."""
+    inputs = [embed_inputs(a) for _, a in ready]
+    with tracing.stage("embed"):
+        flat = executors.embed.submit(embedder.embed_texts, [t for texts in inputs for t in texts]).result()
+    vectors, pos = [], 0
+    for texts in inputs:
+        vectors.append(flat[pos:pos + len(texts)])
+        pos += len(texts)
+    employee_ids = [str(uuid.uuid4()) for _ in ready]
+    payloads = [scoring_payload(a) for _, a in ready]
+    with tracing.stage("qdrant"):
+        embedding_ids = db_qdrant.upsert_embeddings([(e, v[0]) for e, v in zip(employee_ids, vectors)], payloads)
+        chunk_items = [(e, a["chunks"], v[1:], p) for e, (_, a), v, p in zip(employee_ids, ready, vectors, payloads) if len(v) > 1]
+        if chunk_items:
+            db_qdrant.ensure_chunk_collection(len(flat[0]))
+            db_qdrant.upsert_chunks(chunk_items)
+    profiles = [build_profile(e, a, emb, names[idx]) for (idx, a), e, emb in zip(ready, employee_ids, embedding_ids)]
+    with tracing.stage("mongo"):
+        rejected = set(db_mongo.insert_resumes(profiles))
+    if rejected:
+        # lost a race with a concurrent upload of the same content
+        db_qdrant.delete_resumes([employee_ids[i] for i in rejected])
+        existing = db_mongo.get_resumes_by_hashes([ready[i][1]["content_hash"] for i in rejected])
+    for i, ((idx, analysis), employee_id, embedding_id) in enumerate(zip(ready, employee_ids, embedding_ids)):
+        if i in rejected:
+            dup = existing[analysis["content_hash"]]
+            results[idx] = {"filename": names[idx], "status": "duplicate",
+                            "employee_id": dup["employee_id"], "embedding_id": str(dup.get("embedding_id"))}
+        else:
+            results[idx] = {"filename": names[idx], "status": "ok", "employee_id": employee_id, "embedding_id": embedding_id}
+    _update_lexical_index([(e, a) for i, (e, (_, a)) in enumerate(zip(employee_ids, ready)) if i not in rejected])
+    _update_match_cache([(e, v, p) for i, (e, v, p) in enumerate(zip(employee_ids, vectors, payloads)) if i not in rejected])
+
+
+def _flush(ready: List[Tuple[int, Dict[str, Any]]], results: Dict[int, Dict[str, Any]], names: List[str]):
+    try:
+        _store(ready, results, names)
+    except Exception as e:
+        for idx, _ in ready:
+            results[idx] = {"filename": names[idx], "status": "error", "error": str(e)}
+
+
+def ingest_batch(docs: List[Tuple[str, extractor.Source]]) -> Dict[str, Any]:
+    """Ingest many documents; returns per-file status plus aggregate throughput."""
+    start = time.perf_counter()
+    names = [name for name, _ in docs]
+    results: Dict[int, Dict[str, Any]] = {}
+    ready: List[Tuple[int, Dict[str, Any]]] = []
+    in_flight: Dict[Future, int] = {}
+    window = 2 * executors.cpu.workers
+
+    def drain():
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for fut in done:
+            idx = in_flight.pop(fut)
+            try:
+                analysis = fut.result()
+            except Exception as e:
+                tracing.count("extraction_failures")
+                results[idx] = {"filename": names[idx], "status": "error", "error": str(e)}
+                continue
+            tracing.merge(analysis.pop("trace", None))
+            if "ocr_images" in analysis:
+                # back into the window; the OCR'd document comes back through this loop
+                in_flight[executors.ocr.submit(complete_ocr, analysis)] = idx
+                continue
+            if not analysis["raw_text"]:
+                results[idx] = {"filename": names[idx], "status": "error", "error": "Could not extract text"}
+                continue
+            analysis["content_hash"] = hashes[idx]
+            ready.append((idx, analysis))
+        if len(ready) >= EMBED_BATCH_SIZE:
+            _flush(ready, results, names)
+            ready.clear()
+
+    if docs:
+        db_qdrant.ensure_collection(embedder.embedding_dimension())
+    # known documents (stored earlier, or repeated within this batch) skip extraction and embedding
+    hashes = [content_hash(data) for _, data in docs]
+    stored = db_mongo.get_resumes_by_hashes(sorted(set(hashes)))
+    first: Dict[str, int] = {}
+    repeats: Dict[int, int] = {}
+    for idx, digest in enumerate(hashes):
+        if digest in stored:
+            results[idx] = {"filename": names[idx], "status": "duplicate", "employee_id": stored[digest]["employee_id"],
+                            "embedding_id": str(stored[digest].get("embedding_id"))}
+        elif digest in first:
+            repeats[idx] = first[digest]
+        else:
+            first[digest] = idx
+
+    for idx, (_, data) in enumerate(docs):
+        if idx in results or idx in repeats:
+            continue
+        if len(in_flight) >= window:
+            drain()
+        in_flight[executors.cpu.submit(analyze_document, data)] = idx
+    while in_flight:
+        drain()
+    if ready:
+        _flush(ready, results, names)
+    for idx, original in repeats.items():
+        results[idx] = {**results[original], "filename": names[idx]}
+        if results[idx]["status"] == "ok":
+            results[idx]["status"] = "duplicate"
+
+    elapsed = time.perf_counter() - start
+    ordered = [results[i] for i in range(len(docs))]
+    processed = sum(1 for r in ordered if r["status"] == "ok")
+    duplicates = sum(1 for r in ordered if r["status"] == "duplicate")
+    return {
+        "results": ordered,
+        "processed": processed,
+        "duplicates": duplicates,
+        "failed": len(ordered) - processed - duplicates,
+        "elapsed_sec": round(elapsed, 3),
+        "docs_per_sec": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+    }
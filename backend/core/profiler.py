@@ -0,0 +1,83 @@
+"""Sampling profiler that can be switched on at runtime.
+
+A daemon thread snapshots every thread's stack (``sys._current_frames``) at a
+fixed interval and counts identical stacks. ``stop()`` returns them in the
+collapsed format (``outer;inner;leaf count``) that flamegraph.pl and
+speedscope read. Only the API process is sampled; extraction runs in the
+``cpu`` process pool and shows up as time waiting on it.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+MAX_DEPTH = 64
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+_stacks: Counter = Counter()
+_started_at: Optional[float] = None
+_interval = 0.01
+_samples = 0
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+
+def _sample(own_id: int):
+    global _samples
+    while not _stop.wait(_interval):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            _stacks[";".join(reversed(names))] += 1
+        _samples += 1
+
+
+def running() -> bool:
+    return _thread is not None
+
+
+def start(interval_ms: float = 10.0) -> bool:
+    """Begin sampling; False if already running."""
+    global _thread, _started_at, _interval, _samples
+    with _lock:
+        if _thread is not None:
+            return False
+        _stacks.clear()
+        _samples = 0
+        _interval = max(interval_ms, 1.0) / 1000.0
+        _stop.clear()
+        _started_at = time.monotonic()
+        _thread = threading.Thread(target=lambda: _sample(threading.get_ident()), name="profiler", daemon=True)
+        _thread.start()
+        return True
+
+
+def stop() -> str:
+    """Stop sampling and return the collapsed stacks collected since start()."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            return ""
+        _stop.set()
+        _thread.join()
+        _thread = None
+        return "\n".join(f"{stack} {n}" for stack, n in _stacks.most_common()) + "\n"
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "running": running(),
+        "interval_ms": _interval * 1000,
+        "samples": _samples,
+        "seconds": round(time.monotonic() - _started_at, 3) if running() and _started_at else 0.0,
+    }
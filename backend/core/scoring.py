@@ -0,0 +1,144 @@
+"""Vectorized candidate scoring for match ranking.
+
+Candidate skills are held as a CSR-style sparse matrix over a skill
+vocabulary seeded from ``skill_dict.json``; experience and embedding scores
+are NumPy arrays. Skill, experience and final scores for every candidate are
+computed in one pass and the top k are selected with ``argpartition``.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from . import skill_extractor
+
+
+class SkillVocabulary:
+    """Lowercase skill -> column id. Skills outside the dictionary get new ids on first sight."""
+
+    def __init__(self, skills: Iterable[str]):
+        self._index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for s in skills:
+            self.id(s)
+
+    def id(self, skill: str) -> int:
+        key = skill.lower()
+        idx = self._index.get(key)
+        if idx is None:
+            with self._lock:
+                idx = self._index.setdefault(key, len(self._index))
+        return idx
+
+    def ids(self, skills: Iterable[str]) -> np.ndarray:
+        return np.unique(np.fromiter((self.id(s) for s in skills), dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+VOCAB = SkillVocabulary(sorted(skill_extractor.SKILL_DICT))
+
+
+class CandidateBatch:
+    """Column-oriented view of a candidate pool, built once per match request."""
+
+    def __init__(self, skills: Sequence[Iterable[str]], experience_years: Sequence[float],
+                 embedding_scores: Sequence[float], vocab: SkillVocabulary = VOCAB):
+        rows = [vocab.ids(s) for s in skills]
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        self.size = len(rows)
+        self.indices = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+        # row number of every stored skill, for bincount-style row reductions
+        self.row_of = np.repeat(np.arange(self.size), lengths)
+        self.experience = np.asarray(experience_years, dtype=np.float64)
+        self.embedding = np.asarray(embedding_scores, dtype=np.float64)
+        self.vocab = vocab
+
+
+class Scores:
+    def __init__(self, skill: np.ndarray, experience: np.ndarray, embedding: np.ndarray, final: np.ndarray):
+        self.skill = skill
+        self.experience = experience
+        self.embedding = embedding
+        self.final = final
+
+
+def score(batch: CandidateBatch, required_skills: Iterable[str], min_experience: float,
+          skill_weight: float, exp_weight: float, embed_weight: float) -> Scores:
+    req_ids = batch.vocab.ids(required_skills)
+    if len(req_ids) and batch.size:
+        hits = np.isin(batch.indices, req_ids, assume_unique=False)
+        skill = np.bincount(batch.row_of[hits], minlength=batch.size) / float(len(req_ids))
+    else:
+        skill = np.zeros(batch.size)
+    if min_experience > 0:
+        experience = np.minimum(batch.experience / min_experience, 1.0)
+    else:
+        experience = np.zeros(batch.size)
+    final = skill * skill_weight + experience * exp_weight + batch.embedding * embed_weight
+    return Scores(skill, experience, batch.embedding, final)
+
+
+def top_k(values: np.ndarray, k: int) -> List[int]:
+    """Indices of the k largest values, best first."""
+    n = len(values)
+    if k <= 0 or n == 0:
+        return []
+    if k < n:
+        part = np.argpartition(-values, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-values[part], kind="stable")].tolist()
+
+
+def score_jobs(candidate_skills: Iterable[str], candidate_years: float, jd_skills: Sequence[Iterable[str]],
+               jd_min_experience: Sequence[float], embedding_scores: Sequence[float],
+               skill_weight: float, exp_weight: float, embed_weight: float, vocab: SkillVocabulary = VOCAB) -> Scores:
+    """Score one candidate against many JDs; each (JD, candidate) pair scores as score() would."""
+    # same CSR layout as a candidate pool, one row of required skills per JD
+    jobs = CandidateBatch(jd_skills, jd_min_experience, embedding_scores, vocab)
+    required = np.bincount(jobs.row_of, minlength=jobs.size)
+    hits = np.isin(jobs.indices, vocab.ids(candidate_skills))
+    matched = np.bincount(jobs.row_of[hits], minlength=jobs.size)
+    skill = np.divide(matched, required, out=np.zeros(jobs.size), where=required > 0)
+    has_min = jobs.experience > 0
+    experience = np.where(has_min, np.minimum(candidate_years / np.where(has_min, jobs.experience, 1.0), 1.0), 0.0)
+    final = skill * skill_weight + experience * exp_weight + jobs.embedding * embed_weight
+    return Scores(skill, experience, jobs.embedding, final)
+
+
+def skill_overlap(required: Iterable[str], candidate: Iterable[str]) -> Tuple[float, List[str], List[str]]:
+    req_set = set(s.lower() for s in required)
+    cand_set = set(s.lower() for s in candidate)
+    matched = req_set & cand_set
+    score = len(matched) / len(req_set) if req_set else 0.0
+    return score, [m.capitalize() for m in matched], [r.capitalize() for r in req_set - matched]
+
+
+def rank(employee_ids: Sequence[str], profiles: Sequence[Dict[str, Any]], embedding_scores: Sequence[float],
+         required_skills: Iterable[str], min_experience: float,
+         skill_weight: float, exp_weight: float, embed_weight: float, k: int) -> List[Dict[str, Any]]:
+    """Score a candidate pool and return the k best as CandidateMatch-shaped dicts.
+
+    Each profile needs ``skills``, ``experience_years`` and ``summary``.
+    """
+    required_skills = list(required_skills)
+    batch = CandidateBatch([p["skills"] for p in profiles], [p["experience_years"] for p in profiles], embedding_scores)
+    scores = score(batch, required_skills, min_experience, skill_weight, exp_weight, embed_weight)
+    rows = []
+    for i in top_k(scores.final, k):
+        prof = profiles[i]
+        _, matched, missing = skill_overlap(required_skills, prof["skills"])
+        rows.append({
+            "employee_id": employee_ids[i],
+            "final_score": round(float(scores.final[i]), 4),
+            "embedding_score": round(float(scores.embedding[i]), 4),
+            "skill_score": round(float(scores.skill[i]), 4),
+            "experience_score": round(float(scores.experience[i]), 4),
+            "matched_skills": matched,
+            "missing_skills": missing,
+            "experience_years": prof["experience_years"],
+            "summary": prof["summary"][:500],
+        })
+    return rows
@@ -1,21 +1,186 @@
+"""Dictionary-based skill extraction with a precompiled token trie.
+
+The taxonomy (``skill_dict.json``) is either a list of skills or a mapping of
+canonical skill -> list of aliases; ``skill_aliases.json`` adds further
+alias -> canonical entries (e.g. "k8s" -> "kubernetes"). Entries are
+tokenized with the same pattern as documents, so multi-word ("machine
+learning") and symbol skills ("c++", "node.js") match, and each document is
+scanned once left to right taking the longest match at every position.
+
+A token that matches nothing is retried without a trailing version number
+("Java8", "python3.11") and, when it joins several words with ``/`` or ``-``
+("Python/Django", "docker-compose"), as its parts. Entries must be
+unambiguous on their own: "tf" (TensorFlow or Terraform), "ml" (millilitres)
+and "spring" (the season) are not, so Spring is only found as "spring boot",
+"spring framework" or "spring mvc".
+
+The compiled trie is pickled next to the taxonomy and reused on startup while
+the source files are unchanged.
+"""
+import hashlib
 import json
 import os
+import pickle
 import re
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
+
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "..", "models")
+SKILL_JSON_PATH = os.path.join(MODELS_DIR, "skill_dict.json")
+ALIAS_JSON_PATH = os.path.join(MODELS_DIR, "skill_aliases.json")
+TRIE_CACHE_PATH = os.getenv("SKILL_TRIE_CACHE", os.path.join(MODELS_DIR, "skill_trie.pkl"))
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#]*(?:[.\-/][A-Za-z0-9+#]+)*")
+FALLBACK_SKILLS = ["python", "aws", "react", "sql", "docker", "kubernetes"]
+# A version glued to a name: "java8", "python3.11", "angular2+", "c++17"
+VERSION_SUFFIX = re.compile(r"(?<=[a-z+#])\d+(?:\.\d+)*\+?$")
+COMPOUND_SEPARATORS = re.compile(r"[/\-]")
+
+_END = ""  # trie key holding the canonical skill of a complete entry
+_TRIE_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    return [t.lower() for t in TOKEN_PATTERN.findall(text)]
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_taxonomy() -> Dict[str, str]:
+    """Return surface form -> canonical skill, both lowercase."""
+    try:
+        raw = _read_json(SKILL_JSON_PATH)
+    except Exception:
+        raw = FALLBACK_SKILLS
+    entries: Dict[str, str] = {}
+    if isinstance(raw, dict):
+        for canonical, aliases in raw.items():
+            entries[canonical.lower()] = canonical.lower()
+            for alias in aliases or []:
+                entries.setdefault(alias.lower(), canonical.lower())
+    else:
+        for skill in raw:
+            entries[skill.lower()] = skill.lower()
+    if os.path.exists(ALIAS_JSON_PATH):
+        for alias, canonical in _read_json(ALIAS_JSON_PATH).items():
+            entries.setdefault(alias.lower(), canonical.lower())
+    return entries
+
+
+def build_trie(entries: Dict[str, str]) -> Dict[str, Any]:
+    root: Dict[str, Any] = {}
+    for surface, canonical in entries.items():
+        tokens = tokenize(surface)
+        if not tokens:
+            continue
+        node = root
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        node[_END] = canonical
+    return root
+
+
+def _fingerprint() -> str:
+    h = hashlib.sha256(str(_TRIE_VERSION).encode())
+    h.update(TOKEN_PATTERN.pattern.encode())
+    for path in (SKILL_JSON_PATH, ALIAS_JSON_PATH):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+def _load_compiled() -> Tuple[Dict[str, Any], List[str]]:
+    fingerprint = _fingerprint()
+    try:
+        with open(TRIE_CACHE_PATH, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("fingerprint") == fingerprint:
+            return cached["trie"], cached["skills"]
+    except Exception:
+        pass
+    entries = load_taxonomy()
+    trie = build_trie(entries)
+    skills = sorted(set(entries.values()))
+    try:
+        tmp = TRIE_CACHE_PATH + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"fingerprint": fingerprint, "trie": trie, "skills": skills}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, TRIE_CACHE_PATH)
+    except OSError:
+        pass  # read-only deployments just rebuild on each start
+    return trie, skills
+
+
+_TRIE, _SKILLS = _load_compiled()
+SKILL_DICT = set(_SKILLS)
+
+
+def _fallback(token: str, root: Dict[str, Any]) -> List[str]:
+    """Skills in a token the trie does not know as a whole: without its version, or in its parts."""
+    unversioned = VERSION_SUFFIX.sub("", token)
+    if unversioned != token and _END in root.get(unversioned, {}):
+        return [root[unversioned][_END]]
+    if not COMPOUND_SEPARATORS.search(token):
+        return []
+    parts = [p for p in COMPOUND_SEPARATORS.split(token) if p]
+    return find_skills(parts, root) if len(parts) > 1 else []
+
+
+def find_skills(tokens: List[str], trie: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Canonical skills found in a token stream, longest match first, in order of appearance."""
+    root = _TRIE if trie is None else trie
+    found: List[str] = []
+    i, n = 0, len(tokens)
+    while i < n:
+        node = root.get(tokens[i])
+        if node is None:
+            found.extend(_fallback(tokens[i], root))
+            i += 1
+            continue
+        match, end, j = node.get(_END), i + 1, i + 1
+        while j < n:
+            node = node.get(tokens[j])
+            if node is None:
+                break
+            j += 1
+            if _END in node:
+                match, end = node[_END], j
+        if match is not None:
+            found.append(match)
+            i = end
+        else:
+            found.extend(_fallback(tokens[i], root))
+            i += 1
+    return found
+
+
+def canonical_skill(name: str) -> str:
+    """Lowercase canonical form of a skill named on its own ("K8s" -> "kubernetes", "JS" -> "javascript").
+
+    The whole name must be one taxonomy entry (with or without a version);
+    anything else is only lowercased.
+    """
+    tokens = tokenize(name)
+    node: Optional[Dict[str, Any]] = _TRIE
+    for token in tokens:
+        node = node.get(token)
+        if node is None:
+            break
+    if node is not None and _END in node:
+        return node[_END]
+    found = _fallback(tokens[0], _TRIE) if len(tokens) == 1 else []
+    return found[0] if len(found) == 1 else name.strip().lower()
 
-SKILL_JSON_PATH = os.path.join(os.path.dirname(__file__), "..", "models", "skill_dict.json")
-WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z+.#]*")
 
-try:
-    with open(SKILL_JSON_PATH, "r", encoding="utf-8") as f:
-        SKILL_DICT = set(json.load(f))
-except Exception:
-    SKILL_DICT = set(["python", "aws", "react", "sql", "docker", "kubernetes"])
+def canonical_skills(names: List[str]) -> List[str]:
+    """canonical_skill() of each name, without duplicates or blank names, in order."""
+    return list(dict.fromkeys(canonical_skill(n) for n in names if n.strip()))
 
 
 def extract_skills(text: str) -> List[str]:
-    words = set(w.lower() for w in WORD_PATTERN.findall(text))
-    found = [skill for skill in SKILL_DICT if skill.lower() in words]
+    found = find_skills(tokenize(text))
     # Capitalize nicely
     cleaned = sorted(set(s.capitalize() for s in found))
     return cleaned
@@ -0,0 +1,105 @@
+"""Background startup: storage setup and model warm-up off the request path.
+
+The app starts serving immediately. ``/health/live`` only reports that the
+process is up; ``/health/ready`` turns 200 once every required task below has
+succeeded. Tasks run in parallel and failed ones are retried, so a pod whose
+Mongo/Qdrant/Tika is briefly unreachable becomes ready on its own.
+
+  storage  - Qdrant collections (sized from embedder.embedding_dimension(),
+             which does not load the model) and Mongo indexes
+  tika     - start/verify the Tika server (TIKA_MODE managed/remote only)
+  embedder - load the embedding model and run one forward pass (STARTUP_WARMUP)
+  lexical  - replay the BM25 index log into memory, index resumes stored
+             elsewhere meanwhile and keep doing so in the background
+             (LEXICAL_SEARCH only)
+
+Heavy libraries (sentence-transformers/torch, paddleocr) are imported lazily by
+the modules that use them; PaddleOCR loads on the first page that needs OCR.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from . import db_mongo, db_qdrant, embedder, lexical_index, tika_client
+
+WARMUP = os.getenv("STARTUP_WARMUP", "1") not in ("0", "false", "no")
+RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+_tasks: List["Task"] = []
+_stop = threading.Event()
+
+
+class Task:
+    def __init__(self, name: str, fn: Callable[[], Any]):
+        self.name = name
+        self.fn = fn
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+
+    def run(self):
+        while not _stop.is_set():
+            self.state = "running"
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                self.fn()
+            except Exception as e:
+                self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+                if _stop.wait(RETRY_SECONDS):
+                    return
+                continue
+            self.state, self.error = "ready", None
+            self.seconds = round(time.perf_counter() - started, 3)
+            return
+
+
+def _storage():
+    dim = embedder.embedding_dimension()
+    db_qdrant.ensure_collection(dim)
+    db_qdrant.ensure_jd_collection(dim)
+    if db_qdrant.CHUNKS_ENABLED:
+        db_qdrant.ensure_chunk_collection(dim)
+    db_mongo.ensure_indexes()
+
+
+def _embedder():
+    embedder.get_model().encode(["warm up"], show_progress_bar=False, normalize_embeddings=True)
+
+
+def start():
+    """Launch the startup tasks in background threads and return immediately."""
+    if _tasks:
+        return
+    _tasks.append(Task("storage", _storage))
+    if tika_client.enabled():
+        _tasks.append(Task("tika", tika_client.start))
+    if WARMUP:
+        _tasks.append(Task("embedder", _embedder))
+    if lexical_index.ENABLED:
+        _tasks.append(Task("lexical", lexical_index.start))
+    pool = ThreadPoolExecutor(max_workers=len(_tasks), thread_name_prefix="startup")
+    for task in _tasks:
+        pool.submit(task.run)
+    pool.shutdown(wait=False)
+
+
+def stop():
+    _stop.set()
+    lexical_index.stop()
+
+
+def ready() -> bool:
+    return bool(_tasks) and all(t.state == "ready" for t in _tasks)
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "ready": ready(),
+        "model_loaded": embedder.is_loaded(),
+        "tasks": {t.name: {"state": t.state, "attempts": t.attempts, "seconds": t.seconds, "error": t.error}
+                  for t in _tasks},
+    }
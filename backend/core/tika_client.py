@@ -0,0 +1,202 @@
+"""Apache Tika access for the extraction fallback.
+
+TIKA_MODE selects how documents reach Tika:
+
+  library - tika-python's ``parser.from_buffer`` (probes/spawns a JVM lazily)
+  managed - the API starts one local Tika server at startup (TIKA_SERVER_JAR),
+            health-checks it and restarts it if it dies
+  remote  - an already running server at TIKA_SERVER_URL
+
+In managed/remote mode requests go through a keep-alive connection pool with
+timeouts, a concurrency cap, and a circuit breaker so a hung JVM fails fast
+instead of piling up blocked workers. The cap (``slots``) is created in the
+process that owns the executors and handed to its extraction workers by the
+cpu pool's initializer, so it holds under any start method (fork or spawn);
+it is per API or ingest-worker process, not per host. The breaker is per
+process: each extraction worker counts its own failures and opens on its own.
+"""
+import multiprocessing
+import os
+import subprocess
+import threading
+import time
+from typing import Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIKA_MODE = os.getenv("TIKA_MODE", "library")
+TIKA_SERVER_URL = os.getenv("TIKA_SERVER_URL", "http://127.0.0.1:9998").rstrip("/")
+TIKA_SERVER_JAR = os.getenv("TIKA_SERVER_JAR", "")
+TIKA_JAVA = os.getenv("TIKA_JAVA", "java")
+TIKA_TIMEOUT = float(os.getenv("TIKA_TIMEOUT", "30"))
+TIKA_STARTUP_TIMEOUT = float(os.getenv("TIKA_STARTUP_TIMEOUT", "60"))
+TIKA_HEALTH_INTERVAL = float(os.getenv("TIKA_HEALTH_INTERVAL", "15"))
+TIKA_MAX_CONCURRENCY = int(os.getenv("TIKA_MAX_CONCURRENCY", "4"))
+TIKA_BREAKER_FAILURES = int(os.getenv("TIKA_BREAKER_FAILURES", "5"))
+TIKA_BREAKER_RESET = float(os.getenv("TIKA_BREAKER_RESET", "30"))
+CONNECT_TIMEOUT = 2.0
+
+# Replaced in extraction workers by the parent's semaphore (see use_slots()).
+slots = multiprocessing.BoundedSemaphore(TIKA_MAX_CONCURRENCY)
+
+_session: Optional[requests.Session] = None
+_process: Optional[subprocess.Popen] = None
+_monitor: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+class TikaUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures; after ``reset_after`` s lets one probe through."""
+
+    def __init__(self, failures: int, reset_after: float):
+        self.max_failures = failures
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.max_failures or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker(TIKA_BREAKER_FAILURES, TIKA_BREAKER_RESET)
+
+
+def use_slots(shared):
+    """Process pool initializer: share the parent's concurrency cap."""
+    global slots
+    slots = shared
+
+
+def enabled() -> bool:
+    return TIKA_MODE in ("managed", "remote")
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TIKA_MAX_CONCURRENCY)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def healthy() -> bool:
+    try:
+        return get_session().get(f"{TIKA_SERVER_URL}/tika", timeout=(CONNECT_TIMEOUT, CONNECT_TIMEOUT)).ok
+    except requests.RequestException:
+        return False
+
+
+def _spawn():
+    global _process
+    if not TIKA_SERVER_JAR:
+        raise RuntimeError("TIKA_MODE=managed requires TIKA_SERVER_JAR")
+    url = urlparse(TIKA_SERVER_URL)
+    _process = subprocess.Popen(
+        [TIKA_JAVA, "-jar", TIKA_SERVER_JAR, "--host", url.hostname or "127.0.0.1", "--port", str(url.port or 9998)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + TIKA_STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if _process.poll() is not None:
+            raise RuntimeError(f"Tika server exited with code {_process.returncode}")
+        if healthy():
+            return
+        time.sleep(0.5)
+    raise RuntimeError("Tika server did not become healthy in time")
+
+
+def _watch():
+    while not _stop.wait(TIKA_HEALTH_INTERVAL):
+        if _process is not None and _process.poll() is not None:
+            try:
+                _spawn()
+                breaker.record_success()
+            except Exception:
+                pass
+
+
+def start():
+    """Start (managed) or verify (remote) the Tika server. Call once at app startup."""
+    global _monitor
+    if TIKA_MODE == "managed":
+        if not healthy():
+            _spawn()
+        if _monitor is None:
+            _monitor = threading.Thread(target=_watch, name="tika-monitor", daemon=True)
+            _monitor.start()
+    elif TIKA_MODE == "remote" and not healthy():
+        raise RuntimeError(f"Tika server not reachable at {TIKA_SERVER_URL}")
+
+
+def stop():
+    _stop.set()
+    if _process is not None and _process.poll() is None:
+        _process.terminate()
+        try:
+            _process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _process.kill()
+
+
+def parse(data: Union[bytes, memoryview]) -> str:
+    """Plain text of a document via the Tika server; raises TikaUnavailable on failure."""
+    if not breaker.allow():
+        raise TikaUnavailable("circuit open")
+    if not slots.acquire(timeout=TIKA_TIMEOUT):
+        breaker.record_failure()
+        raise TikaUnavailable("no free Tika slot")
+    try:
+        resp = get_session().put(
+            f"{TIKA_SERVER_URL}/tika",
+            data=bytes(data),
+            headers={"Accept": "text/plain"},
+            timeout=(CONNECT_TIMEOUT, TIKA_TIMEOUT),
+        )
+        if resp.status_code >= 500:
+            resp.raise_for_status()
+    except requests.RequestException as e:
+        breaker.record_failure()
+        raise TikaUnavailable(str(e)) from e
+    finally:
+        slots.release()
+    breaker.record_success()
+    # 4xx means Tika is healthy but could not parse this document
+    return resp.text if resp.ok else ""
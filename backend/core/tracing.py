@@ -0,0 +1,114 @@
+"""Per-stage timers and event counters for the request paths.
+
+``with tracing.stage("ocr"):`` observes the ``stage_seconds{stage="ocr"}``
+histogram, tracks ``stage_in_flight`` and adds the time to the current
+request's breakdown (sent as a ``Server-Timing`` header when enabled).
+
+Code running in the ``cpu`` process pool cannot reach the API process's
+metrics, so ``analyze_document`` runs under ``collect()`` and returns what it
+recorded; the caller hands that to ``merge()``. Thread pools inherit the
+request context (see executors.BoundedExecutor.run).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from . import metrics
+
+STAGE_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# Events counted along the extraction path.
+EVENTS = {
+    "ocr_pages": "Pages or images sent to OCR because they had no text layer",
+    "tika_fallbacks": "Documents handed to Tika (unknown type or a native parser failed)",
+    "parser_errors": "Native PDF/DOCX/image parsers that raised",
+    "extraction_failures": "Documents whose extraction raised or produced no text",
+}
+
+_collector: ContextVar[Optional[Dict[str, Dict[str, float]]]] = ContextVar("trace_collector", default=None)
+_request: ContextVar[Optional[Dict[str, float]]] = ContextVar("trace_request", default=None)
+
+
+def _hist(name: str) -> metrics.Histogram:
+    return metrics.histogram("stage_seconds", STAGE_BUCKETS, "Time spent per pipeline stage", {"stage": name})
+
+
+def _in_flight(name: str) -> metrics.Gauge:
+    return metrics.gauge("stage_in_flight", "Stage executions currently running", {"stage": name})
+
+
+def _observe(name: str, seconds: float):
+    collector = _collector.get()
+    if collector is not None:
+        timings = collector["timings"]
+        timings[name] = timings.get(name, 0.0) + seconds
+        return
+    _hist(name).observe(seconds)
+    breakdown = _request.get()
+    if breakdown is not None:
+        breakdown[name] = breakdown.get(name, 0.0) + seconds
+
+
+def count(event: str, amount: float = 1.0):
+    collector = _collector.get()
+    if collector is not None:
+        counts = collector["counts"]
+        counts[event] = counts.get(event, 0.0) + amount
+        return
+    metrics.counter(f"{event}_total", EVENTS.get(event, "")).inc(amount)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    gauge = _in_flight(name) if _collector.get() is None else None
+    if gauge is not None:
+        gauge.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(name, time.perf_counter() - started)
+        if gauge is not None:
+            gauge.dec()
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, Dict[str, float]]]:
+    """Record stages/events into a plain dict instead of the metrics (for pool workers)."""
+    collected: Dict[str, Dict[str, float]] = {"timings": {}, "counts": {}}
+    token = _collector.set(collected)
+    try:
+        yield collected
+    finally:
+        _collector.reset(token)
+
+
+def merge(collected: Optional[Dict[str, Dict[str, Any]]]):
+    """Apply what a collect() block recorded, in the calling process and request."""
+    if not collected:
+        return
+    for name, seconds in collected.get("timings", {}).items():
+        _observe(name, seconds)
+    for event, amount in collected.get("counts", {}).items():
+        count(event, amount)
+
+
+@contextmanager
+def request() -> Iterator[Dict[str, float]]:
+    breakdown: Dict[str, float] = {}
+    token = _request.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _request.reset(token)
+
+
+def server_timing(breakdown: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in breakdown.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+for _event, _help in EVENTS.items():
+    metrics.counter(f"{_event}_total", _help)
@@ -1,27 +1,121 @@
-from fastapi import FastAPI
-from .api import api_router
-from .core import embedder, db_qdrant
-import spacy
 import os
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from .api import api_router
+from .core import db_qdrant, executors, metrics, profiler, startup, tika_client, tracing
+
+# Send a per-stage Server-Timing header on every response (else only when the request sends X-Server-Timing).
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+# Expose /debug/profiler/*; off by default since stacks reveal code paths.
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0").lower() in ("1", "true", "yes")
+REQUEST_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
 
 app = FastAPI(title="Resume Matcher", version="0.1.0")
 app.include_router(api_router)
 
-_NLP = None
+_in_flight = metrics.gauge("http_requests_in_flight", "Requests currently being served")
 
 @app.on_event("startup")
 def startup_event():
-    # Load spaCy model if available (optional for NER enhancements)
-    global _NLP
-    model_name = os.getenv("SPACY_MODEL", "en_core_web_sm")
+    # Storage setup, Tika and model warm-up run in the background; see /health/ready
+    startup.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    startup.stop()
+    executors.shutdown_all()
+    tika_client.stop()
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    _in_flight.inc()
+    started = time.perf_counter()
     try:
-        _NLP = spacy.load(model_name)
-    except Exception:
-        _NLP = None
-    # Ensure Qdrant collection exists with model dimension
-    dim = embedder.embedding_dimension()
-    db_qdrant.ensure_collection(dim)
+        with tracing.request() as breakdown:
+            response = await call_next(request)
+    finally:
+        _in_flight.dec()
+    elapsed = time.perf_counter() - started
+    endpoint = request.scope.get("endpoint")
+    metrics.histogram("http_request_seconds", REQUEST_BUCKETS, "Request latency by handler",
+                      {"handler": endpoint.__name__ if endpoint else "unmatched",
+                       "status": str(response.status_code)}).observe(elapsed)
+    if SERVER_TIMING or request.headers.get("x-server-timing"):
+        response.headers["Server-Timing"] = tracing.server_timing(breakdown, elapsed)
+    return response
+
+
+@app.exception_handler(executors.Overloaded)
+async def overloaded_handler(request: Request, exc: executors.Overloaded):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(db_qdrant.AliasMoved)
+async def alias_moved_handler(request: Request, exc: db_qdrant.AliasMoved):
+    # writes wait for this process to be restarted on the re-embedded model
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
+
+@app.exception_handler(tika_client.TikaUnavailable)
+async def tika_unavailable_handler(request: Request, exc: tika_client.TikaUnavailable):
+    return JSONResponse(status_code=503, content={"detail": f"Tika unavailable: {exc}"},
+                        headers={"Retry-After": str(int(tika_client.TIKA_BREAKER_RESET))})
 
 @app.get("/")
 async def root():
     return {"status": "ok", "message": "Resume Matcher API"}
+
+
+@app.get("/health/live")
+async def live():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def ready():
+    """200 once storage is set up and models are warm, else 503 with per-task state."""
+    status = startup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/stats")
+async def stats():
+    """In-process counters and histograms (e.g. embedder batch size / queue wait)."""
+    return metrics.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _require_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.get("/debug/profiler")
+async def profiler_status():
+    _require_profiler()
+    return profiler.status()
+
+
+@app.post("/debug/profiler/start")
+async def profiler_start(interval_ms: float = 10.0):
+    """Start sampling all threads of this process every interval_ms."""
+    _require_profiler()
+    if not profiler.start(interval_ms):
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    return profiler.status()
+
+
+@app.post("/debug/profiler/stop", response_class=PlainTextResponse)
+async def profiler_stop():
+    """Stop sampling; returns collapsed stacks (flamegraph.pl / speedscope input)."""
+    _require_profiler()
+    if not profiler.running():
+        raise HTTPException(status_code=409, detail="Profiler not running")
+    return PlainTextResponse(profiler.stop())
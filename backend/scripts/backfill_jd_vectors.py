@@ -0,0 +1,37 @@
+"""Copy JD embeddings stored in Mongo into the Qdrant JD collection.
+Run: python -m backend.scripts.backfill_jd_vectors
+
+JDs processed before the JD collection existed are invisible to
+/match/jobs-for/{employee_id} until this has been run once. Re-running is
+safe: JD ids are the point ids, so existing points are overwritten.
+"""
+from ..core import db_mongo, db_qdrant, pipeline
+
+BATCH_SIZE = 256
+PROJECTION = {"_id": 0, "jd_id": 1, "embedding": 1, "skills": 1, "min_experience": 1, "seniority": 1}
+
+
+def flush(batch):
+    db_qdrant.upsert_jds([(jd["jd_id"], jd["embedding"]) for jd in batch], [pipeline.jd_payload(jd) for jd in batch])
+
+
+def main():
+    db = db_mongo.get_db()
+    done = 0
+    batch = []
+    for jd in db.job_descriptions.find({"embedding": {"$exists": True}}, PROJECTION, batch_size=500):
+        if not batch and not done:
+            db_qdrant.ensure_jd_collection(len(jd["embedding"]))
+        batch.append(jd)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            done += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        done += len(batch)
+    print(f"[done] Upserted {done} JD vectors")
+
+
+if __name__ == "__main__":
+    main()
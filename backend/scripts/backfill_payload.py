@@ -0,0 +1,27 @@
+"""Copy scoring fields from Mongo into the Qdrant payload of existing points.
+Run: python -m backend.scripts.backfill_payload
+
+Points written before skills/experience_years/summary were stored in the
+payload are invisible to /match/run hard filters (must_have_skills, min_years)
+until this has been run once.
+"""
+from ..core import db_mongo, db_qdrant
+
+PROJECTION = {"_id": 0, "employee_id": 1, "embedding_id": 1, "skills": 1, "experience_years": 1, "sections.summary": 1}
+
+
+def main():
+    db = db_mongo.get_db()
+    done = 0
+    for prof in db.resumes.find({"embedding_id": {"$exists": True}}, PROJECTION, batch_size=500):
+        db_qdrant.set_payload(prof["embedding_id"], {
+            "skills": [s.lower() for s in prof.get("skills", [])],
+            "experience_years": prof.get("experience_years", 0.0),
+            "summary": prof.get("sections", {}).get("summary", "")[:500],
+        })
+        done += 1
+    print(f"[done] Updated payload for {done} points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Add stored resumes to the BM25 index used by hybrid /match/run retrieval.
+Run: python -m backend.scripts.build_lexical_index
+
+Uploads are indexed as they are stored, and searches pick up resumes stored
+by other hosts (lexical_index.catch_up); this checks every stored resume, so
+it covers resumes stored before the index existed (or while LEXICAL_SEARCH
+was off) and any whose index update failed. Re-running is safe: resumes
+already in the index are skipped. To rebuild from scratch, stop the API,
+delete LEXICAL_INDEX_DIR and run it again.
+"""
+from ..core import lexical_index
+
+
+def main():
+    added = lexical_index.catch_up(full=True)
+    index = lexical_index.get_index()
+    print(f"[done] Indexed {added} resumes ({len(index)} in {index.directory})")
+
+
+if __name__ == "__main__":
+    main()
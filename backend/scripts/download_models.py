@@ -1,5 +1,5 @@
 """Utility script to download and stage local models.
-Run: python backend/scripts/download_models.py
+Run: python backend/scripts/download_models.py [--onnx] [--int8]
 
 Environment variables (optional):
   SENTENCE_MODEL_NAME  (default: sentence-transformers/all-MiniLM-L6-v2)
@@ -8,9 +8,13 @@ Environment variables (optional):
 This script:
   - Downloads SentenceTransformer model into embeddings dir if empty.
   - Creates OCR directory structure placeholders (does NOT auto-download PaddleOCR tar files).
+  - With --onnx, exports the embedding model to ONNX (--int8 adds a dynamically
+    quantized copy) for EMBED_BACKEND=onnx / onnx-int8, then checks its vectors
+    against the PyTorch model and exits non-zero if they diverge.
 
 For PaddleOCR manual download, see MODELS.md.
 """
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -45,10 +49,36 @@ def prepare_ocr_dirs():
     print("[next] Download tar files (see MODELS.md) and extract into respective subfolders.")
 
 
+def export_onnx(quantize: bool) -> bool:
+    sys.path.insert(0, str(Path.cwd()))
+    from backend.core import onnx_backend
+
+    print(f"[export] ONNX{' + int8' if quantize else ''} from {EMBED_DIR} ...")
+    try:
+        path = onnx_backend.export(str(EMBED_DIR), quantize=quantize)
+    except ImportError as e:
+        print(f"Export needs torch, transformers and onnxruntime ({e}). Run: pip install sentence-transformers onnx onnxruntime")
+        return False
+    print(f"[done] Wrote {path}")
+    report = onnx_backend.check_accuracy(str(EMBED_DIR), path)
+    print(f"[check] cosine vs PyTorch over {report['samples']} samples: "
+          f"min {report['min_cosine']:.5f}, mean {report['mean_cosine']:.5f}")
+    if report["min_cosine"] < onnx_backend.MIN_COSINE:
+        print(f"[fail] min cosine below EMBED_ONNX_MIN_COSINE={onnx_backend.MIN_COSINE}; keep EMBED_BACKEND=torch")
+        return False
+    return True
+
+
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--onnx", action="store_true", help="export the embedding model to ONNX")
+    parser.add_argument("--int8", action="store_true", help="also write an int8 dynamically quantized model")
+    args = parser.parse_args()
     os.chdir(Path(__file__).resolve().parents[2])  # move to project root
     ensure_embedding_model()
     prepare_ocr_dirs()
+    if (args.onnx or args.int8) and not export_onnx(args.int8):
+        sys.exit(1)
     print("[summary] Model prep complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""Process resumes queued by POST /resumes/upload-async.
+Run: python -m backend.scripts.ingest_worker [--concurrency N] [--once]
+     python -m backend.scripts.ingest_worker --dead            (list dead jobs)
+     python -m backend.scripts.ingest_worker --requeue [JOB_ID ...]
+
+Run as many workers as needed, on any host that reaches Mongo and Qdrant and
+has the embedding model: jobs are leased atomically (see core/ingest_queue.py),
+so each job runs in one place at a time and a crashed worker's jobs are picked
+up by the others. Each worker runs ``--concurrency`` jobs at once; extraction
+uses the ``cpu`` process pool and embedding the ``embed`` pool, as in the API.
+With TIKA_MODE=managed the worker starts its own Tika server unless one is
+already healthy at TIKA_SERVER_URL (remote: checks it is reachable). A job
+whose document needs Tika while it is down is retried with backoff.
+SIGTERM/SIGINT stop claiming new jobs; running jobs finish first. Errors
+outside a job (e.g. Mongo unreachable) are logged and retried with backoff;
+the exit code is non-zero unless the worker was stopped by a signal or, with
+``--once``, ran out of jobs.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+
+from ..core import db_mongo, db_qdrant, embedder, executors, ingest_queue, lexical_index, tika_client
+
+POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "1"))
+# Wait after an unexpected error (Mongo unreachable, broken pool); doubles while errors repeat.
+ERROR_BACKOFF_SECONDS = float(os.getenv("INGEST_ERROR_BACKOFF_SECONDS", "1"))
+ERROR_BACKOFF_MAX_SECONDS = 60.0
+
+
+def log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def work(worker_id: str, stop: threading.Event, once: bool):
+    backoff = ERROR_BACKOFF_SECONDS
+    while not stop.is_set():
+        try:
+            job = ingest_queue.claim(worker_id)
+            if job is None:
+                if once:
+                    return
+                stop.wait(POLL_SECONDS)
+                continue
+            state = ingest_queue.run_job(job)
+            log(f"[{worker_id}] {job['_id']} ({job.get('filename')}) attempt {job['attempts']}: {state}")
+        except db_qdrant.AliasMoved:
+            raise  # this process embeds with the old model: exit so it is restarted on the new one
+        except Exception as e:
+            # the job (if any) is reclaimed once its lease expires
+            log(f"[{worker_id}] {type(e).__name__}: {e}; retrying in {backoff:g}s")
+            stop.wait(backoff)
+            backoff = min(backoff * 2, ERROR_BACKOFF_MAX_SECONDS)
+            continue
+        backoff = ERROR_BACKOFF_SECONDS
+
+
+def slot(worker_id: str, stop: threading.Event, once: bool, crashed: threading.Event):
+    """Run work(); if it dies anyway, stop the other slots so the process exits non-zero and is restarted."""
+    try:
+        work(worker_id, stop, once)
+    except BaseException:
+        log(f"[{worker_id}] crashed:\n{traceback.format_exc()}")
+        crashed.set()
+        stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest worker for the durable upload queue")
+    parser.add_argument("--concurrency", type=int, default=executors.cpu.workers, help="jobs processed at once")
+    parser.add_argument("--once", action="store_true", help="exit when no job is runnable instead of polling")
+    parser.add_argument("--dead", action="store_true", help="list dead jobs and exit")
+    parser.add_argument("--requeue", nargs="*", metavar="JOB_ID", help="requeue dead jobs (all if no ids) and exit")
+    args = parser.parse_args()
+
+    db_mongo.ensure_indexes()
+    if args.dead:
+        for job in ingest_queue.dead_jobs():
+            last = job["errors"][-1] if job.get("errors") else {}
+            log(f"{job['_id']}  {job.get('filename')}  attempts={job['attempts']}  {last.get('stage')}: {last.get('error')}")
+        return
+    if args.requeue is not None:
+        log(f"[done] Requeued {ingest_queue.requeue(args.requeue)} jobs")
+        return
+
+    embedder.get_model()  # load before claiming, so a lease is not spent on model loading
+    if tika_client.enabled():
+        tika_client.start()
+    if lexical_index.ENABLED:
+        lexical_index.get_index()
+    stop, crashed = threading.Event(), threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [threading.Thread(target=slot, args=(f"{base}:{i}", stop, args.once, crashed), name=f"ingest-{i}")
+               for i in range(max(1, args.concurrency))]
+    log(f"[start] {base} with {len(threads)} slots")
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        for t in threads:
+            t.join(0.5)
+    executors.shutdown_all()
+    tika_client.stop()
+    if crashed.is_set():
+        log("[error] Worker stopped after a crash")
+        sys.exit(1)
+    log("[done] Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
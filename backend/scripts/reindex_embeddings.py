@@ -0,0 +1,317 @@
+"""Re-embed every stored resume and JD with the current model into new collections, then swap aliases.
+Run: python -m backend.scripts.reindex_embeddings [--model-path DIR] [--batch-size 512] [--no-swap]
+
+Needed whenever the model in local_models/embeddings (or EMBED_MODEL_PATH)
+changes: vectors from different models are not comparable, and a model with
+another dimension makes ensure_collection refuse to start.
+
+The job builds ``resumes_vN``, ``resume_chunks_vN`` and ``job_descriptions_vN``
+next to the live collections, which keep serving queries through their
+aliases. Resumes (cleaned_text + section chunks) and JDs (raw_text) are read
+from Mongo in _id order, encoded in large batches and upserted in bulk while
+the next batch is encoding. New JD vectors go to ``embedding_next`` in Mongo
+until the swap. Progress is checkpointed in ``reindex_jobs`` after every batch,
+keyed by the model fingerprint; re-running the same command resumes.
+
+When everything is embedded (including documents uploaded meanwhile), all
+aliases are switched in one request. From then on, running API and ingest
+processes refuse writes through the aliases (HTTP 503; queued jobs go back to
+the queue) and keep searching the collections they started with until they
+are restarted on the new model, see db_qdrant.check_writable and serving. Once every process has noticed the switch
+(QDRANT_ALIAS_CHECK_SECONDS plus a grace period), a last pass embeds what was
+stored in the meantime. Checkpoints compare ObjectIds, which come from client
+clocks, and an insert can commit after a pass went past its id; so every
+document stored since the job started is then checked against the new
+collections, and those stored around the switch are re-embedded outright.
+Finally JD embeddings are promoted and the match cache is cleared. Restart the API and workers on the new model right after the swap.
+With ``--no-swap`` the job stops once built; run it again without the flag
+when deploying. The previous collections are kept for rollback.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from ..core import classifier, db_mongo, db_qdrant, embedder, match_cache, pipeline
+from ..core.embed_cache import EmbeddingCache
+
+JOBS = "reindex_jobs"
+# Added to QDRANT_ALIAS_CHECK_SECONDS before the last pass, for writes already past their check.
+SWAP_GRACE_SECONDS = 5.0
+# How late an insert may commit after its ObjectId was generated (as lexical_index.CATCH_UP_LOOKBACK).
+COMMIT_LOOKBACK = timedelta(minutes=5)
+RECHECK_BATCH = 1000
+RESUME_PROJECTION = {"employee_id": 1, "cleaned_text": 1, "sections": 1, "skills": 1, "experience_years": 1}
+JD_PROJECTION = {"jd_id": 1, "raw_text": 1, "skills": 1, "min_experience": 1, "seniority": 1}
+SOURCES = ("resumes", "jds")
+
+
+def log(msg: str):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def next_version() -> int:
+    """One more than the highest version of any live or versioned collection."""
+    client = db_qdrant.get_client()
+    names = [c.name for c in client.get_collections().collections]
+    versions = [0]
+    for base in (db_qdrant.COLLECTION_NAME, db_qdrant.CHUNK_COLLECTION_NAME, db_qdrant.JD_COLLECTION_NAME):
+        prefix = base + "_v"
+        versions += [int(n[len(prefix):]) for n in names if n.startswith(prefix) and n[len(prefix):].isdigit()]
+    return max(versions) + 1
+
+
+def load_job(model_id: str, dim: int, restart: bool) -> Dict[str, Any]:
+    jobs = db_mongo.get_db()[JOBS]
+    job = jobs.find_one({"_id": model_id})
+    if job and not restart:
+        return job
+    version = next_version()
+    job = {
+        "_id": model_id,
+        "version": version,
+        "dim": dim,
+        "state": "building",
+        "collections": {
+            db_qdrant.COLLECTION_NAME: db_qdrant.versioned_name(db_qdrant.COLLECTION_NAME, version),
+            db_qdrant.CHUNK_COLLECTION_NAME: db_qdrant.versioned_name(db_qdrant.CHUNK_COLLECTION_NAME, version),
+            db_qdrant.JD_COLLECTION_NAME: db_qdrant.versioned_name(db_qdrant.JD_COLLECTION_NAME, version),
+        },
+        "after": {s: None for s in SOURCES},
+        "done": {s: 0 for s in SOURCES},
+        "started_at": datetime.now(timezone.utc),
+    }
+    jobs.replace_one({"_id": model_id}, job, upsert=True)
+    return job
+
+
+def checkpoint(job: Dict[str, Any], source: str, last_id, count: int):
+    job["after"][source] = last_id
+    job["done"][source] += count
+    db_mongo.get_db()[JOBS].update_one({"_id": job["_id"]}, {"$set": {
+        f"after.{source}": last_id, f"done.{source}": job["done"][source], "updated_at": datetime.now(timezone.utc)}})
+
+
+def resume_batch(docs: List[Dict[str, Any]], names: Dict[str, str]):
+    """Encode a batch of stored profiles; returns the write to run for it."""
+    analyses = []
+    for doc in docs:
+        analysis = {
+            "cleaned_text": doc.get("cleaned_text") or "",
+            "sections": doc.get("sections") or {},
+            "skills": doc.get("skills") or [],
+            "experience_years": doc.get("experience_years", 0.0),
+        }
+        analysis["chunks"] = classifier.chunk_sections(
+            analysis["sections"], analysis["cleaned_text"], pipeline.CHUNK_WORDS, pipeline.CHUNK_OVERLAP)
+        analyses.append(analysis)
+    inputs = [pipeline.embed_inputs(a) for a in analyses]
+    flat = embedder.embed_texts([t for texts in inputs for t in texts])
+
+    def write():
+        vectors, pos = [], 0
+        for texts in inputs:
+            vectors.append(flat[pos:pos + len(texts)])
+            pos += len(texts)
+        payloads = [pipeline.scoring_payload(a) for a in analyses]
+        db_qdrant.upsert_embeddings([(d["employee_id"], v[0]) for d, v in zip(docs, vectors)], payloads,
+                                    collection=names[db_qdrant.COLLECTION_NAME])
+        chunk_items = [(d["employee_id"], a["chunks"], v[1:], p)
+                       for d, a, v, p in zip(docs, analyses, vectors, payloads) if len(v) > 1]
+        if chunk_items:
+            db_qdrant.upsert_chunks(chunk_items, collection=names[db_qdrant.CHUNK_COLLECTION_NAME])
+    return write
+
+
+def jd_batch(docs: List[Dict[str, Any]], names: Dict[str, str]):
+    vectors = embedder.embed_texts([d.get("raw_text") or "" for d in docs])
+
+    def write():
+        db_qdrant.upsert_jds([(d["jd_id"], v) for d, v in zip(docs, vectors)], [pipeline.jd_payload(d) for d in docs],
+                             collection=names[db_qdrant.JD_COLLECTION_NAME])
+        db_mongo.get_db().job_descriptions.bulk_write(
+            [UpdateOne({"_id": d["_id"]}, {"$set": {"embedding_next": v}}) for d, v in zip(docs, vectors)],
+            ordered=False)
+    return write
+
+
+def batches(cursor, size: int):
+    batch: List[Dict[str, Any]] = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_source(job: Dict[str, Any], source: str, batch_size: int, writer: ThreadPoolExecutor,
+               only: Optional[List[ObjectId]] = None) -> int:
+    """Embed everything after the source's checkpoint, or just the ``only`` documents (not checkpointed).
+
+    Writes of batch i overlap encoding of batch i+1.
+    """
+    db = db_mongo.get_db()
+    if source == "resumes":
+        collection, projection, encode = db.resumes, RESUME_PROJECTION, resume_batch
+        query: Dict[str, Any] = {"cleaned_text": {"$exists": True}}
+    else:
+        collection, projection, encode = db.job_descriptions, JD_PROJECTION, jd_batch
+        query = {"raw_text": {"$exists": True}}
+    if only is not None:
+        query["_id"] = {"$in": only}
+    elif job["after"][source] is not None:
+        query["_id"] = {"$gt": job["after"][source]}
+    total = 0
+    pending: Optional[Tuple[Future, Any, int]] = None
+    started = time.perf_counter()
+
+    def settle():
+        nonlocal total
+        fut, last_id, count = pending
+        fut.result()
+        if only is None:
+            checkpoint(job, source, last_id, count)
+        total += count
+        log(f"[{source}] {job['done'][source]} embedded ({total / (time.perf_counter() - started):.1f}/s)")
+
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    try:
+        for batch in batches(cursor, batch_size):
+            write = encode(batch, job["collections"])
+            if pending is not None:
+                settle()
+            pending = (writer.submit(write), batch[-1]["_id"], len(batch))
+        if pending is not None:
+            settle()
+    finally:
+        cursor.close()
+    return total
+
+
+def bulk_update(collection, query: Dict[str, Any], projection: Dict[str, Any], update: Callable[[Dict[str, Any]], Dict[str, Any]]):
+    ops = []
+    for doc in collection.find(query, projection).batch_size(1000):
+        ops.append(UpdateOne({"_id": doc["_id"]}, update(doc)))
+        if len(ops) >= 1000:
+            collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
+
+def catch_up(job: Dict[str, Any], batch_size: int, writer: ThreadPoolExecutor):
+    """Embed what was stored since the checkpoints, until a pass finds nothing new."""
+    while sum(run_source(job, source, batch_size, writer) for source in SOURCES):
+        pass
+
+
+def missed(job: Dict[str, Any], source: str) -> List[ObjectId]:
+    """Documents stored since the job started whose new vectors may be missing or from the old model."""
+    db = db_mongo.get_db()
+    since = ObjectId.from_datetime(job["started_at"] - COMMIT_LOOKBACK)
+    # old-model processes wrote through the switched aliases until they noticed
+    switched = ObjectId.from_datetime(job["switched_at"] - COMMIT_LOOKBACK)
+    found: List[ObjectId] = []
+    if source == "jds":
+        # jd_batch sets embedding_next, store_jd never does
+        for doc in db.job_descriptions.find({"_id": {"$gt": since}, "raw_text": {"$exists": True}},
+                                            {"embedding_next": 1}):
+            if doc["_id"] > switched or "embedding_next" not in doc:
+                found.append(doc["_id"])
+        return found
+    collection = job["collections"][db_qdrant.COLLECTION_NAME]
+    cursor = db.resumes.find({"_id": {"$gt": since}, "cleaned_text": {"$exists": True}},
+                             {"employee_id": 1}).batch_size(RECHECK_BATCH)
+    for docs in batches(cursor, RECHECK_BATCH):
+        stored = db_qdrant.existing_points([db_qdrant.point_id(d["employee_id"]) for d in docs], collection)
+        found += [d["_id"] for d in docs
+                  if d["_id"] > switched or db_qdrant.point_id(d["employee_id"]) not in stored]
+    return found
+
+
+def recheck(job: Dict[str, Any], batch_size: int, writer: ThreadPoolExecutor):
+    for source in SOURCES:
+        ids = missed(job, source)
+        for start in range(0, len(ids), RECHECK_BATCH):
+            run_source(job, source, batch_size, writer, only=ids[start:start + RECHECK_BATCH])
+        log(f"[swap] re-embedded {len(ids)} {source} stored during the job")
+
+
+def swap(job: Dict[str, Any], batch_size: int, writer: ThreadPoolExecutor):
+    db = db_mongo.get_db()
+    targets = dict(job["collections"])
+    if not db_qdrant.CHUNKS_ENABLED:
+        targets.pop(db_qdrant.CHUNK_COLLECTION_NAME)
+    if job["state"] != "switched":
+        job["previous"] = db_qdrant.switch_aliases(targets)
+        job["state"] = "switched"
+        job["switched_at"] = datetime.now(timezone.utc)
+        db[JOBS].update_one({"_id": job["_id"]}, {"$set": {
+            "state": "switched", "previous": job["previous"], "switched_at": job["switched_at"]}})
+    # until the writers notice the switch, uploads reach only the old collections or put
+    # old-model vectors into the new ones; the last pass re-embeds both
+    wait = db_qdrant.ALIAS_CHECK_SECONDS + SWAP_GRACE_SECONDS
+    log(f"[swap] aliases switched; re-embedding what is stored in the next {wait:g}s")
+    time.sleep(wait)
+    catch_up(job, batch_size, writer)
+    recheck(job, batch_size, writer)
+    # the stored JD embedding is what /match/run uses for jd_id requests
+    bulk_update(db.job_descriptions, {"embedding_next": {"$exists": True}}, {"embedding_next": 1},
+                lambda jd: {"$set": {"embedding": jd["embedding_next"]}, "$unset": {"embedding_next": ""}})
+    # profiles stored before point ids were deterministic still reference their old integer ids
+    bulk_update(db.resumes, {"embedding_id": {"$type": "number"}}, {"employee_id": 1},
+                lambda prof: {"$set": {"embedding_id": db_qdrant.point_id(prof["employee_id"])}})
+    match_cache.invalidate()
+    db[JOBS].update_one({"_id": job["_id"]}, {"$set": {"state": "swapped", "swapped_at": datetime.now(timezone.utc)}})
+    previous = job["previous"]
+    for alias, collection in targets.items():
+        log(f"[swap] {alias} -> {collection} (was {previous[alias] or 'a plain collection, now dropped'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed stored resumes and JDs into new collections")
+    parser.add_argument("--model-path", help="embedding model directory (default: EMBED_MODEL_PATH / local_models/embeddings)")
+    parser.add_argument("--batch-size", type=int, default=512, help="documents read, encoded and upserted per batch")
+    parser.add_argument("--no-swap", action="store_true", help="build and checkpoint only; switch aliases on a later run")
+    parser.add_argument("--restart", action="store_true", help="discard this model's checkpoint and start a new version")
+    args = parser.parse_args()
+
+    if args.model_path:
+        embedder.use_model(args.model_path)
+    model_id = embedder.model_identity()
+    # every document is new to this model; keep the job out of the serving caches
+    embedder.set_cache(EmbeddingCache(model_id, max_items=0, directory=""))
+    dim = embedder.embedding_dimension()
+    db_mongo.ensure_indexes()
+
+    job = load_job(model_id, dim, args.restart)
+    if job["state"] == "swapped":
+        log(f"[done] Already re-embedded and swapped to version {job['version']}; use --restart to run again")
+        return
+    log(f"[start] version {job['version']}, {dim}-d vectors, resuming after {job['done']}")
+    names = job["collections"]
+    db_qdrant.create_collection(names[db_qdrant.COLLECTION_NAME], dim)
+    db_qdrant.create_collection(names[db_qdrant.JD_COLLECTION_NAME], dim, db_qdrant.JD_PAYLOAD_INDEXES)
+    if db_qdrant.CHUNKS_ENABLED:
+        db_qdrant.create_collection(names[db_qdrant.CHUNK_COLLECTION_NAME], dim, db_qdrant.CHUNK_PAYLOAD_INDEXES)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="reindex-write") as writer:
+        # uploads made meanwhile are included
+        catch_up(job, args.batch_size, writer)
+        log(f"[built] {job['done']['resumes']} resumes, {job['done']['jds']} JDs")
+        if args.no_swap and job["state"] != "switched":
+            log("[done] Not swapped (--no-swap); re-run without it to catch up and switch aliases")
+            return
+        swap(job, args.batch_size, writer)
+    log("[done] Restart the API and ingest workers with the new model")
+
+
+if __name__ == "__main__":
+    main()